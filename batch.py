@@ -0,0 +1,218 @@
+"""
+Generates quizzes for a whole folder of PDFs without the Streamlit UI.
+
+Every PDF under the input directory is ingested, embedded and indexed once, and a quiz
+is generated for every topic of the topics file (one topic per line, blank lines and
+lines starting with # are ignored). Documents are processed across a pool of worker
+processes, with separate limits on how many workers may parse, embed or call the LLM
+at the same time. Each finished quiz is appended to the output as one JSON line:
+
+    {"source": ..., "doc_hash": ..., "topic": ..., "status": "ok", "questions": [...], "stats": {...}, "seconds": ...}
+
+Quizzes that could not be completed are recorded with status "incomplete" or "error".
+Rerunning with the same output file skips every (document, topic) pair that already
+has an "ok" record, so an interrupted run resumes where it stopped.
+
+Run from the repository root:
+    python batch.py course_pdfs/ topics.txt --output quizzes.jsonl --workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from tasks.task_3.page_cache import PageCache
+from tasks.task_3.task_3 import DocumentProcessor
+from tasks.task_4.task_4 import EmbeddingClient
+from tasks.task_5.task_5 import ChromaCollectionCreator
+from tasks.task_8.response_cache import ResponseCache
+from tasks.task_8.task_8 import QuizGenerator
+
+# Per-process state of the pool workers, see _init_worker()
+_worker = {}
+
+def read_topics(path):
+    """Returns the topics of a topics file, one per non-blank line, ignoring # comments."""
+    with open(path, encoding="utf-8") as file:
+        lines = (line.strip() for line in file)
+        return [line for line in lines if line and not line.startswith("#")]
+
+def find_pdfs(directory):
+    """Returns the paths of every PDF under `directory`, sorted so runs process them in the same order."""
+    paths = []
+    for root, _, file_names in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in file_names if name.lower().endswith(".pdf"))
+    return sorted(paths)
+
+def read_finished(output_path):
+    """
+    Returns {doc_hash: set of topics} for the quizzes the output file already holds with status "ok".
+    A truncated last line, left behind by an interrupted run, is ignored.
+    """
+    finished = {}
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                finished.setdefault(record["doc_hash"], set()).add(record["topic"])
+    return finished
+
+def _init_worker(config, finished, semaphores, records):
+    _worker.update(config=config, finished=finished, semaphores=semaphores, records=records)
+
+def _process_document(path):
+    """
+    Worker task: builds the collection of one PDF and generates a quiz per remaining topic.
+    Records are put on the shared queue as each quiz finishes, followed by `path` as end marker.
+    """
+    config, semaphores, records = _worker["config"], _worker["semaphores"], _worker["records"]
+    source = os.path.relpath(path, config["input_dir"])
+    doc_hash = None
+    try:
+        with open(path, "rb") as file:
+            file_bytes = file.read()
+        doc_hash = PageCache.hash_bytes(file_bytes)
+        topics = [topic for topic in config["topics"] if topic not in _worker["finished"].get(doc_hash, ())]
+        if not topics:
+            records.put(path)
+            return
+
+        processor = DocumentProcessor()
+        with semaphores["ingest"]:
+            processor.ingest_files([(source, file_bytes)], [doc_hash])
+
+        embed_client = EmbeddingClient.shared(**config["embed_config"])
+        # In-memory collections, since concurrent workers cannot share one persistent Chroma directory
+        chroma_creator = ChromaCollectionCreator(processor, embed_client, persist_directory=None, headless=True)
+        with semaphores["embed"]:
+            chroma_creator.create_chroma_collection()
+        if not chroma_creator.db:
+            raise ValueError("No text could be extracted from the document.")
+    except Exception as error:
+        records.put({"source": source, "doc_hash": doc_hash, "topic": None, "status": "error", "error": repr(error)})
+        records.put(path)
+        return
+
+    response_cache = ResponseCache() if config["response_cache"] else None
+    try:
+        for topic in topics:
+            start = time.perf_counter()
+            try:
+                generator = QuizGenerator(
+                    topic, config["num_questions"], chroma_creator,
+                    concurrency=config["llm_concurrency"], questions_per_call=config["questions_per_call"],
+                    response_cache=response_cache,
+                )
+                with semaphores["llm"]:
+                    questions = generator.generate_quiz()
+            except Exception as error:
+                records.put({"source": source, "doc_hash": doc_hash, "topic": topic, "status": "error", "error": repr(error)})
+                continue
+            records.put({
+                "source": source,
+                "doc_hash": doc_hash,
+                "topic": topic,
+                "status": "ok" if len(questions) == config["num_questions"] else "incomplete",
+                "questions": questions,
+                "stats": generator.stats,
+                "seconds": round(time.perf_counter() - start, 3),
+            })
+    finally:
+        records.put(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir", help="Directory searched recursively for PDF files.")
+    parser.add_argument("topics_file", help="Text file with one quiz topic per line.")
+    parser.add_argument("--output", default="quizzes.jsonl", help="JSONL file the quizzes are appended to.")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--questions-per-call", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--max-ingest", type=int, default=None, help="Workers parsing PDFs at once; defaults to all.")
+    parser.add_argument("--max-embed", type=int, default=2, help="Workers embedding chunks at once.")
+    parser.add_argument("--max-llm", type=int, default=4, help="Workers generating quizzes at once.")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="LLM calls in flight per generating worker.")
+    parser.add_argument("--response-cache", action="store_true", help="Serve identical prompts from the disk response cache.")
+    parser.add_argument("--embedding-model", default="textembedding-gecko@003")
+    parser.add_argument("--embedding-backend", choices=("vertex", "hashing"), default="vertex")
+    parser.add_argument("--project", default=None)
+    parser.add_argument("--location", default="us-central1")
+    parser.add_argument("--key-file", default=None, help="Service account key file for Vertex AI.")
+    args = parser.parse_args()
+
+    topics = read_topics(args.topics_file)
+    paths = find_pdfs(args.input_dir)
+    finished = read_finished(args.output)
+    print(f"{len(paths)} PDFs, {len(topics)} topics, {sum(map(len, finished.values()))} quizzes already finished.")
+
+    config = {
+        "input_dir": args.input_dir,
+        "topics": topics,
+        "num_questions": args.num_questions,
+        "questions_per_call": args.questions_per_call,
+        "llm_concurrency": args.llm_concurrency,
+        "response_cache": args.response_cache,
+        "embed_config": {
+            "model_name": args.embedding_model,
+            "project": args.project,
+            "location": args.location,
+            "key_file_path": args.key_file,
+            "backend": args.embedding_backend,
+        },
+    }
+    semaphores = {
+        "ingest": multiprocessing.BoundedSemaphore(args.max_ingest or args.workers),
+        "embed": multiprocessing.BoundedSemaphore(args.max_embed),
+        "llm": multiprocessing.BoundedSemaphore(args.max_llm),
+    }
+    written = failed = 0
+    # A manager queue, since a worker's put() on a multiprocessing.Queue returns before the record is sent,
+    # and the record is lost if the pool breaks and terminates that worker meanwhile
+    with multiprocessing.Manager() as manager:
+        records = manager.Queue()
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(config, finished, semaphores, records)) as pool, \
+                open(args.output, "a", encoding="utf-8") as output:
+            tasks = {pool.submit(_process_document, path): path for path in paths}
+
+            def write(record):
+                nonlocal written, failed
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                if record["status"] == "ok":
+                    written += 1
+                else:
+                    failed += 1
+                    print(f"{record['source']} / {record['topic']}: {record['status']} {record.get('error', '')}")
+
+            # Every task ends with its path as marker, so the run is over once every marker arrived
+            ended = set()
+            while len(ended) < len(paths):
+                try:
+                    record = records.get(timeout=1)
+                except queue.Empty:
+                    if all(task.done() for task in tasks):
+                        break  # Some tasks ended without their marker, because their worker died
+                    continue
+                if isinstance(record, str):
+                    ended.add(record)
+                    continue
+                write(record)
+
+            # A worker that dies breaks the pool, which fails every task that had not finished with BrokenProcessPool
+            for task, path in tasks.items():
+                if path not in ended and task.exception() is not None:
+                    source = os.path.relpath(path, args.input_dir)
+                    write({"source": source, "doc_hash": None, "topic": None, "status": "error", "error": repr(task.exception())})
+
+    print(f"Wrote {written} quizzes to {args.output}, {failed} incomplete or failed.")
+
+if __name__ == "__main__":
+    main()
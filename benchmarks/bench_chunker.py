@@ -0,0 +1,69 @@
+"""
+Compares OffsetTextSplitter with the CharacterTextSplitter it replaced in
+ChromaCollectionCreator.create_chroma_collection, on synthetic page text.
+
+Run from the repository root:
+    python -m benchmarks.bench_chunker --pages 1000
+"""
+import argparse
+import random
+import time
+
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter
+
+from tasks.task_5.chunker import OffsetTextSplitter
+
+WORDS = (
+    "cell energy membrane protein enzyme light chlorophyll glucose oxygen carbon "
+    "respiration mitochondria nucleus gene transcription ribosome molecule reaction"
+).split()
+
+def synthetic_pages(page_count, chars_per_page=3000, seed=0):
+    """Returns page Documents of random words broken into lines and paragraphs."""
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(page_count):
+        lines = []
+        size = 0
+        while size < chars_per_page:
+            line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+            if rng.random() < 0.15:
+                line += "\n"
+            lines.append(line)
+            size += len(line) + 1
+        pages.append(Document(page_content="\n".join(lines), metadata={"source": "synthetic.pdf", "page": page_number}))
+    return pages
+
+def best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages)
+    character_splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=100)
+    offset_splitter = OffsetTextSplitter(chunk_tokens=250, overlap_tokens=25)
+
+    character_time, character_chunks = best_of(args.repeat, lambda: character_splitter.split_documents(pages))
+    offset_time, offset_chunks = best_of(args.repeat, lambda: list(offset_splitter.split_documents(pages)))
+
+    print(f"{args.pages} pages, best of {args.repeat}")
+    print(f"{'splitter':<24}{'seconds':>10}{'chunks':>10}{'pages/s':>12}")
+    for name, seconds, chunks in (
+        ("CharacterTextSplitter", character_time, character_chunks),
+        ("OffsetTextSplitter", offset_time, offset_chunks),
+    ):
+        print(f"{name:<24}{seconds:>10.3f}{len(chunks):>10}{args.pages / seconds:>12.0f}")
+    print(f"speedup: {character_time / offset_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Measures every stage of the quiz pipeline (ingest, split, embed, index, retrieve,
+generate) with the real task classes, over synthetic PDFs of increasing size.
+
+The embedding model and the LLM are replaced by local stand-ins with a configurable
+injected latency, so runs are offline, deterministic and only measure our own code
+plus the simulated model time. For every PDF size and stage the report holds the
+number of items processed, the throughput, the p50/p99 latency of a single item
+(a page, a chunk, an embedding batch, a query or a question) and the peak Python
+memory allocated during the stage. The ingest stage is timed as a whole, and its
+per-page latencies come from a separate pass that parses the PDF page by page.
+A small warm-up run first pays for the one-time imports, then every size is run
+twice: once for the timings, and once without the injected latency under
+tracemalloc for the memory, which tracing would slow down.
+
+The report is printed, or written with --output, as JSON so it can be kept as a
+baseline and compared against later runs.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --pages 10,100,500,2000 --output baseline.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.language_models.llms import LLM
+
+from benchmarks.bench_chunker import WORDS
+from tasks.task_3.pdf_parsing import iter_page_range
+from tasks.task_3.task_3 import DocumentProcessor
+from tasks.task_4.local_embeddings import HashingEmbeddings
+from tasks.task_4.task_4 import EmbeddingClient
+from tasks.task_5.chunker import OffsetTextSplitter
+from tasks.task_5.task_5 import ChromaCollectionCreator
+from tasks.task_8.task_8 import QuizGenerator
+
+def synthetic_pdf(page_count, lines_per_page=40, seed=0):
+    """Returns the bytes of a PDF with `page_count` pages of random words, written without any PDF library."""
+    rng = random.Random(seed)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{3 + 2 * page} 0 R" for page in range(page_count)), page_count
+        ),
+    ]
+    font = 3 + 2 * page_count
+    for page in range(page_count):
+        lines = (" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))) for _ in range(lines_per_page))
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * page} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(pdf)
+
+class LatencyEmbeddings(HashingEmbeddings):
+    """HashingEmbeddings that sleeps like a remote model would and records the latency of every call."""
+
+    def __init__(self, latency, latency_per_text, dimension=768):
+        super().__init__(dimension)
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.timings = []
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        time.sleep(self.latency + self.latency_per_text * len(texts))
+        vectors = super().embed_documents(texts)
+        self.timings.append(time.perf_counter() - start)
+        return vectors
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+_llm_calls = itertools.count()
+_runs = itertools.count()  # Every run embeds into a fresh cache
+
+class LatencyLLM(LLM):
+    """An LLM stand-in that sleeps for `latency` seconds and answers with well-formed quiz questions."""
+
+    latency: float = 0.0
+    seed: int = 0
+
+    @property
+    def _llm_type(self):
+        return "latency"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        rng = random.Random(self.seed * 1_000_003 + next(_llm_calls))
+        multi_question = re.search(r"create (\d+) different quiz questions", prompt)
+        count = int(multi_question.group(1)) if multi_question else 1
+        questions = [
+            {
+                "question": " ".join(rng.sample(WORDS, 8)) + "?",
+                "choices": [{"key": key, "value": rng.choice(WORDS)} for key in "ABCD"],
+                "answer": rng.choice("ABCD"),
+                "explanation": " ".join(rng.sample(WORDS, 6)),
+            }
+            for _ in range(count)
+        ]
+        return json.dumps(questions if count > 1 else questions[0])
+
+def summarize(timings, seconds, items, peak_bytes):
+    """Returns the report entry of a stage from its per-item timings, in seconds."""
+    timings = sorted(timings)
+
+    def percentile(fraction):
+        if not timings:
+            return None
+        return round(timings[min(len(timings) - 1, int(fraction * len(timings)))] * 1000, 3)
+
+    return {
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(items / seconds, 2) if seconds else None,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "peak_memory_mb": round(peak_bytes / (1024 * 1024), 3) if peak_bytes is not None else None,
+    }
+
+class Stage:
+    """Context manager that times a stage and, while tracemalloc is tracing, its peak memory above the starting point."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.peak_bytes = None
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        if tracemalloc.is_tracing():
+            self.peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - self._base)
+
+def run_pipeline(page_count, args, workdir, latency=True):
+    """
+    Runs every stage once over a synthetic PDF of `page_count` pages and returns the per-stage report.
+    :param latency: Whether the model stand-ins sleep for the configured latencies.
+    """
+    stages = {}
+    pdf = synthetic_pdf(page_count, seed=page_count)
+
+    processor = DocumentProcessor(cache_dir=None)
+    with Stage() as stage:
+        processor.ingest_files([(f"synthetic-{page_count}.pdf", pdf)])
+    # ingest_files parses the whole file at once, so the per-page latencies are measured in a separate pass
+    timings = []
+    start = time.perf_counter()
+    for _ in iter_page_range(pdf):
+        now = time.perf_counter()
+        timings.append(now - start)
+        start = now
+    stages["ingest"] = summarize(timings, stage.seconds, page_count, stage.peak_bytes)
+
+    splitter = OffsetTextSplitter(chunk_tokens=250, overlap_tokens=25)
+    timings = []
+    with Stage() as stage:
+        chunks = []
+        for page in processor.iter_pages():
+            start = time.perf_counter()
+            chunks.extend(splitter.split_documents([page]))
+            timings.append(time.perf_counter() - start)
+    stages["split"] = summarize(timings, stage.seconds, len(chunks), stage.peak_bytes)
+
+    if latency:
+        embeddings = LatencyEmbeddings(args.embed_latency, args.embed_latency_per_text)
+    else:
+        embeddings = LatencyEmbeddings(0.0, 0.0)
+    embed_client = EmbeddingClient(
+        "bench", backend="hashing", cache_path=os.path.join(workdir, f"embeddings-{next(_runs)}.sqlite3"),
+    )
+    embed_client.client = embeddings
+    with Stage() as stage:
+        embed_client.embed_documents([chunk.page_content for chunk in chunks])
+    stages["embed"] = summarize(embeddings.timings, stage.seconds, len(chunks), stage.peak_bytes)
+
+    # The chunk embeddings are cached by now, so this measures splitting, cache lookups and index building
+    chroma_creator = ChromaCollectionCreator(processor, embed_client, persist_directory=None, backend=args.backend)
+    with Stage() as stage:
+        chroma_creator.create_chroma_collection()
+    stages["index"] = summarize([stage.seconds], stage.seconds, len(chunks), stage.peak_bytes)
+
+    rng = random.Random(page_count)
+    queries = [" ".join(rng.sample(WORDS, 3)) for _ in range(args.queries)]
+    timings = []
+    with Stage() as stage:
+        for query in queries:
+            start = time.perf_counter()
+            chroma_creator.query_chroma_collection_batch([query], k=4)
+            timings.append(time.perf_counter() - start)
+    stages["retrieve"] = summarize(timings, stage.seconds, len(queries), stage.peak_bytes)
+
+    generator = QuizGenerator(
+        "cell energy", args.questions, chroma_creator,
+        concurrency=args.llm_concurrency, questions_per_call=args.questions_per_call,
+    )
+    generator.llm = LatencyLLM(latency=args.llm_latency if latency else 0.0, seed=page_count)
+    timings = []
+    with Stage() as stage:
+        start = time.perf_counter()
+        for _ in generator.iter_quiz():
+            now = time.perf_counter()
+            timings.append(now - start)  # Time since the previous question
+            start = now
+    stages["generate"] = summarize(timings, stage.seconds, len(timings), stage.peak_bytes)
+    stages["generate"]["llm_calls"] = generator.stats["llm_calls"]
+
+    processor.pages.close()
+    return {"pages": page_count, "chunks": len(chunks), "stages": stages}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,100,500,2000", help="Comma separated page counts of the synthetic PDFs.")
+    parser.add_argument("--backend", choices=("auto", "numpy", "chroma"), default="auto")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Seconds of latency per embedding request.")
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.0005, help="Extra seconds per embedded text.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds of latency per LLM call.")
+    parser.add_argument("--llm-concurrency", type=int, default=2)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--questions-per-call", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file instead of printing it.")
+    args = parser.parse_args()
+
+    page_counts = [int(pages) for pages in args.pages.split(",")]
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        run_pipeline(2, args, workdir, latency=False)  # Warm-up, pays for lazy imports and first-call setup
+        for page_count in page_counts:
+            run = run_pipeline(page_count, args, workdir)
+
+            tracemalloc.start()
+            traced = run_pipeline(page_count, args, workdir, latency=False)
+            tracemalloc.stop()
+            for name, stage in run["stages"].items():
+                stage["peak_memory_mb"] = traced["stages"][name]["peak_memory_mb"]
+
+            report["runs"].append(run)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
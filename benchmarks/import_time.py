@@ -0,0 +1,124 @@
+"""
+Measures the cold import time of the task modules with `python -X importtime` and
+fails if any of them exceeds the startup budget.
+
+Each module is imported in a fresh interpreter, so nothing is shared between the
+measurements. The report lists the cumulative import time of every module and the
+slowest packages it pulled in; the exit status is 1 if a budget was exceeded.
+
+The library modules (MODULES) are held to --budget-ms. The Streamlit app entry point
+(ENTRY_POINTS) has to import streamlit itself, about 400 ms on its own, so it is held
+to the separate --entry-budget-ms. Not measured:
+- main.py, a sketch of the screens that imports a `service` module which does not exist.
+- tasks/task_6 and tasks/task_7, the earlier course steps that task_8 and task_10 replace.
+  They still import streamlit and, for task_7, langchain_google_vertexai eagerly.
+
+Run from the repository root:
+    python -m benchmarks.import_time --budget-ms 500
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = (
+    "tasks.task_3.task_3",
+    "tasks.task_4.task_4",
+    "tasks.task_5.task_5",
+    "tasks.task_8.task_8",
+    "tasks.task_8.question_pool",
+    "tasks.task_9.task_9",
+)
+
+ENTRY_POINTS = (
+    "tasks.task_10.task_10",
+)
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into a list of (package, self_us, cumulative_us, depth) tuples,
+    in the order the imports finished.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # The header line
+        name = fields[2].rstrip()
+        package = name.lstrip()
+        depth = (len(name) - len(package) - 1) // 2
+        imports.append((package, int(fields[0]), int(fields[1]), depth))
+    return imports
+
+def direct_imports(imports, module):
+    """Returns (package, cumulative_us) of the imports made directly by `module`'s own code."""
+    end = max(index for index, (package, _, _, depth) in enumerate(imports) if package == module and depth == 0)
+    direct = []
+    for package, _, cumulative, depth in reversed(imports[:end]):
+        if depth == 0:
+            break  # The previous top-level import, such as a parent package
+        if depth == 1:
+            direct.append((package, cumulative))
+    return direct
+
+def measure(module, repeat):
+    """Imports `module` in `repeat` fresh interpreters and returns the imports of the fastest run."""
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+        imports = parse_importtime(result.stderr)
+        total = next(cumulative for package, _, cumulative, _ in reversed(imports) if package == module)
+        if best is None or total < best[0]:
+            best = (total, imports)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", help="Modules to measure at --budget-ms instead of the defaults.")
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="Allowed cumulative import time per module.")
+    parser.add_argument("--entry-budget-ms", type=float, default=1000.0, help="Allowed import time of an app entry point.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest direct imports to list per module.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON instead of a table.")
+    args = parser.parse_args()
+
+    if args.modules:
+        budgets = {module: args.budget_ms for module in args.modules}
+    else:
+        budgets = {module: args.budget_ms for module in MODULES}
+        budgets.update((module, args.entry_budget_ms) for module in ENTRY_POINTS)
+
+    report = []
+    for module, budget_ms in budgets.items():
+        total, imports = measure(module, args.repeat)
+        dependencies = sorted(direct_imports(imports, module), key=lambda item: item[1], reverse=True)
+        report.append({
+            "module": module,
+            "import_ms": total / 1000,
+            "budget_ms": budget_ms,
+            "within_budget": total / 1000 <= budget_ms,
+            "slowest": [{"package": package, "import_ms": cumulative / 1000} for package, cumulative in dependencies[:args.top]],
+        })
+
+    if args.json:
+        print(json.dumps({"modules": report}, indent=2))
+    else:
+        print(f"best of {args.repeat}")
+        print(f"{'module':<32}{'ms':>10}{'budget':>10}  slowest imports")
+        for entry in report:
+            slowest = ", ".join(f"{item['package']} {item['import_ms']:.0f}" for item in entry["slowest"])
+            flag = "" if entry["within_budget"] else "  OVER BUDGET"
+            print(f"{entry['module']:<32}{entry['import_ms']:>10.1f}{entry['budget_ms']:>10.0f}  {slowest}{flag}")
+
+    if not all(entry["within_budget"] for entry in report):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import importlib
+import sys
+
+class LazyModule:
+    """
+    Stands in for a module that is imported on first attribute access.
+
+    The heavy SDKs (streamlit, langchain, Vertex AI, google.auth, chromadb) take seconds to
+    import, so task modules bind them through lazy_import() and only pay for the ones a code
+    path actually uses, when it first uses them.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            # importlib serializes concurrent imports of the same module
+            module = self.__dict__["_module"] = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name):
+    """
+    Returns the module `name` if it is already imported, or a LazyModule that imports it on first use.
+    :param name: The absolute module name, e.g. "langchain_google_vertexai".
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
@@ -1,12 +1,44 @@
 import streamlit as st
 import os
 import sys
+import threading
+if __name__ == "__main__":
+    # Make the tasks package importable when this file is run as a script
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from tasks.task_3.task_3 import DocumentProcessor
 from tasks.task_4.task_4 import EmbeddingClient
 from tasks.task_5.task_5 import ChromaCollectionCreator
-from tasks.task_8.task_8 import QuizGenerator
+from tasks.task_8.question_pool import QuestionPool
+from tasks.task_8.response_cache import ResponseCache
 from tasks.task_9.task_9 import QuizManager
 
+@st.cache_resource
+def get_embedding_client(**embed_config):
+    """Returns the embedding client shared by every session and rerun of this process."""
+    return EmbeddingClient.shared(**embed_config)
+
+# Serving identical prompts from the disk response cache is opt-in, since cached quizzes repeat questions
+USE_RESPONSE_CACHE = os.environ.get("QUIZZIFY_RESPONSE_CACHE", "").lower() in ("1", "true", "yes", "on")
+
+@st.cache_resource
+def get_response_cache():
+    """
+    Returns the LLM response cache shared by every session and rerun of this process,
+    or None unless the QUIZZIFY_RESPONSE_CACHE environment variable enables it.
+    """
+    return ResponseCache() if USE_RESPONSE_CACHE else None
+
+def get_collection(processor, embed_client):
+    """
+    Returns this session's ChromaCollectionCreator for the documents currently held by `processor`,
+    kept in session state keyed by their hashes so reruns and resubmissions of the same PDFs reuse it.
+    """
+    key = tuple(processor.document_hashes)
+    cached = st.session_state.get("collection")
+    if cached is None or cached[0] != key:
+        cached = st.session_state["collection"] = (key, ChromaCollectionCreator(processor, embed_client))
+    return cached[1]
+
 if __name__ == "__main__":
     
     embed_config = { "model_name": "textembedding-gecko@003", "project": "radical-ai", "location": "us-central1", "key_file_path": "/Path/To/JSON/Key/File" }
@@ -25,12 +57,15 @@ if __name__ == "__main__":
             with st.form("Load Data to Chroma"):
                 st.write("Select PDFs for Ingestion, the topic for the quiz, and click Generate!")
                 
-                processor = DocumentProcessor()
+                # The processor lives in session state, so unchanged uploads are not ingested again
+                if "processor" not in st.session_state:
+                    st.session_state["processor"] = DocumentProcessor()
+                processor = st.session_state["processor"]
                 processor.ingest_documents()
             
-                embed_client = EmbeddingClient(**embed_config)
+                embed_client = get_embedding_client(**embed_config)
             
-                chroma_creator = ChromaCollectionCreator(processor, embed_client)
+                chroma_creator = get_collection(processor, embed_client)
                 
                 # Set topic input and number of questions
                 topic_input = st.text_input("Enter the topic:")
@@ -39,17 +74,43 @@ if __name__ == "__main__":
                 submitted = st.form_submit_button("Submit")
                 
                 if submitted:
-                    chroma_creator.create_chroma_collection()
+                    # Only build the collection the first time these documents are submitted
+                    if chroma_creator.db is None:
+                        chroma_creator.create_chroma_collection()
                         
                     if len(processor.pages) > 0:
                         st.write(f"Generating {num_questions} questions for topic: {topic_input}")
                     
-                    # Initialize a QuizGenerator class
-                    quiz_generator = QuizGenerator(topic_input, num_questions, chroma_creator)
-                    # Generate quiz questions
-                    st.session_state["question_bank"] = quiz_generator.generate_quiz()
-                    # Initialize question index
-                    st.session_state["question_index"] = 0
+                    # Serve the quiz from the background question pool for these documents and topic,
+                    # which keeps generating with a QuizGenerator so the next quiz is ready instantly
+                    question_pool = QuestionPool.for_topic(
+                        chroma_creator, topic_input,
+                        concurrency=2, questions_per_call=5, response_cache=get_response_cache()
+                    )
+                    # Start the quiz as soon as the first question is ready, and let a background
+                    # thread append the rest to the question bank as they are generated
+                    questions = question_pool.iter_take(num_questions)
+                    first_question = next(questions, None)
+                    if first_question is None:
+                        # The pool gave up without a single question, e.g. because every LLM call failed
+                        error = f" Last error: {question_pool.last_error!r}" if question_pool.last_error else ""
+                        st.error(f"Failed to generate questions for this topic!{error}", icon="🚨")
+                    else:
+                        question_bank = [first_question]
+                        quiz_complete = threading.Event()
+
+                        def fill_question_bank():
+                            try:
+                                for question in questions:
+                                    question_bank.append(question)
+                            finally:
+                                quiz_complete.set()
+
+                        threading.Thread(target=fill_question_bank, daemon=True).start()
+                        st.session_state["question_bank"] = question_bank
+                        st.session_state["quiz_complete"] = quiz_complete
+                        # Initialize question index
+                        st.session_state["question_index"] = 0
 
     elif "display_quiz" not in st.session_state or st.session_state["display_quiz"]:
         
@@ -94,8 +155,15 @@ if __name__ == "__main__":
                 
                 
 
-                # Reset the question index when all questions have been answered
+                # Reset the question index when all questions have been answered, or wait on the
+                # current question while the next one is still being generated
                 if st.session_state["question_index"] >= len(st.session_state["question_bank"]):
-                    st.session_state["display_quiz"] = False
-                    st.session_state["question_index"] = 0
+                    if "quiz_complete" not in st.session_state or st.session_state["quiz_complete"].is_set():
+                        st.session_state["display_quiz"] = False
+                        st.session_state["question_index"] = 0
+                    else:
+                        st.session_state["question_index"] = len(st.session_state["question_bank"]) - 1
+                        st.info("The next question is still being generated, please try again in a moment.")
+                elif "quiz_complete" in st.session_state and not st.session_state["quiz_complete"].is_set():
+                    st.caption(f"{len(st.session_state['question_bank'])} questions ready, more on the way...")
 
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+
+class PageCache:
+    """
+    A content-addressed, on-disk cache of extracted PDF pages.
+
+    Each uploaded file is keyed by the SHA-256 of its raw bytes, so the same PDF
+    uploaded under a different name (or re-uploaded on a Streamlit rerun) maps to
+    the same entry. The extracted pages are stored as one JSON line per page,
+    and the directory is kept under `max_bytes` by evicting the least recently
+    used entries first.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        """
+        :param cache_dir: Directory in which cached page files are stored.
+        :param max_bytes: Upper bound on the total size of the cache directory.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_bytes(data):
+        """Returns the hex SHA-256 digest used as the cache key for `data`."""
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jsonl")
+
+    def get(self, key):
+        """
+        Looks up the pages extracted from the file with the given hash.
+
+        :param key: The SHA-256 hex digest of the uploaded file.
+        :return: A lazy iterator of (page_content, metadata) tuples, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except OSError:
+            self.misses += 1
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        os.utime(path)
+        self.hits += 1
+        return self._read_pages(f)
+
+    def put(self, key, pages):
+        """
+        Stores the pages extracted from the file with the given hash.
+
+        :param key: The SHA-256 hex digest of the uploaded file.
+        :param pages: An iterable of (page_content, metadata) tuples.
+        """
+        for _ in self.write_through(key, pages):
+            pass
+
+    def write_through(self, key, pages):
+        """
+        Yields the given pages unchanged while writing them to the cache, so pages can be
+        cached and consumed in a single streaming pass. The entry is only committed once
+        the iterable has been fully consumed.
+
+        :param key: The SHA-256 hex digest of the uploaded file.
+        :param pages: An iterable of (page_content, metadata) tuples.
+        """
+        # Write to a temporary file first so a concurrent reader never sees a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for page_content, metadata in pages:
+                    f.write(json.dumps({"text": page_content, "metadata": metadata}))
+                    f.write("\n")
+                    yield page_content, metadata
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".jsonl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+    @staticmethod
+    def _read_pages(f):
+        with f:
+            for line in f:
+                record = json.loads(line)
+                yield record["text"], record["metadata"]
@@ -0,0 +1,95 @@
+import tempfile
+import threading
+from array import array
+
+from tasks.lazy import lazy_import
+
+lc_documents = lazy_import("langchain_core.documents")
+
+class PageStore:
+    """
+    A compact, list-like container for extracted pages.
+
+    Page text is appended to an anonymous spill file on disk and only the byte offsets,
+    page numbers and an index into a small table of sources are kept in memory, so
+    memory use stays flat no matter how many pages are ingested. Pages are materialized
+    as LangChain Documents only when they are read, one at a time.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(mode="w+b")
+        self._lock = threading.Lock()
+        self._offsets = array("Q", [0])  # Byte offset where each page starts, plus the end offset
+        self._page_numbers = array("L")
+        self._source_ids = array("L")
+        self._sources = []  # Distinct (source, doc_hash) pairs
+        self._source_index = {}
+
+    def __len__(self):
+        return len(self._page_numbers)
+
+    def __getitem__(self, index):
+        index = self._check_index(index)
+        return lc_documents.Document(page_content=self.text(index), metadata=self.metadata(index))
+
+    def __iter__(self):
+        """Lazily yields each page as a Document, reading its text from the spill file on demand."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, page_content, metadata):
+        """
+        Appends a page to the store.
+        :param page_content: The text of the page.
+        :param metadata: A dict with the page's "source", "page" and "doc_hash".
+        """
+        source = (metadata.get("source"), metadata.get("doc_hash"))
+        source_id = self._source_index.get(source)
+        if source_id is None:
+            source_id = self._source_index[source] = len(self._sources)
+            self._sources.append(source)
+
+        data = page_content.encode("utf-8")
+        with self._lock:
+            self._file.seek(self._offsets[-1])
+            self._file.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+            self._page_numbers.append(metadata.get("page", 0))
+            self._source_ids.append(source_id)
+
+    def extend(self, pages):
+        """
+        Appends pages from an iterable of (page_content, metadata) tuples or Documents.
+        The iterable is consumed lazily, so it may be a generator.
+        """
+        for page in pages:
+            if isinstance(page, tuple):
+                self.append(*page)
+            else:
+                self.append(page.page_content, page.metadata)
+
+    def text(self, index):
+        """Returns only the text content of the page at `index`, read with a single seek."""
+        index = self._check_index(index)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        with self._lock:
+            self._file.seek(start)
+            data = self._file.read(end - start)
+        return data.decode("utf-8")
+
+    def metadata(self, index):
+        """Returns the metadata dict of the page at `index`."""
+        index = self._check_index(index)
+        source, doc_hash = self._sources[self._source_ids[index]]
+        return {"source": source, "page": self._page_numbers[index], "doc_hash": doc_hash}
+
+    def close(self):
+        """Releases the spill file."""
+        self._file.close()
+
+    def _check_index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+        return index
@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from tasks.lazy import lazy_import
+
+pypdf = lazy_import("pypdf")
+
+# This module only depends on pypdf so that process-pool workers start quickly.
+
+def count_pages(file_bytes):
+    """Returns the number of pages in the PDF held in `file_bytes`."""
+    return len(pypdf.PdfReader(BytesIO(file_bytes)).pages)
+
+def extract_page_range(file_bytes, start=0, stop=None):
+    """
+    Extracts the text of pages [start, stop) straight from the in-memory PDF bytes.
+
+    :param file_bytes: The raw bytes of the PDF.
+    :param start: Index of the first page to extract.
+    :param stop: Index one past the last page to extract, or None for the end of the document.
+    :return: A list of (page_number, text) tuples.
+    """
+    return list(iter_page_range(file_bytes, start, stop))
+
+def iter_page_range(file_bytes, start=0, stop=None):
+    """Lazy version of extract_page_range that yields one (page_number, text) tuple at a time."""
+    reader = pypdf.PdfReader(BytesIO(file_bytes))
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for page_number in range(start, stop):
+        yield page_number, reader.pages[page_number].extract_text()
+
+def iter_pages_parallel(files, max_workers=None, pages_per_task=50):
+    """
+    Extracts the pages of several PDFs across a process pool.
+
+    Files longer than `pages_per_task` are split into page ranges, so a single large
+    PDF is spread over several workers instead of pinning one of them. All ranges are
+    submitted up front and their results are handed back as they are consumed, so only
+    the ranges not yet read are held in memory.
+
+    :param files: A list of raw PDF byte strings.
+    :param max_workers: Number of worker processes; defaults to the CPU count.
+    :param pages_per_task: Maximum number of pages parsed by one task.
+    :return: A generator yielding, for each input file in order, an iterator of its
+             (page_number, text) tuples. Each iterator must be consumed before the next.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            [
+                executor.submit(extract_page_range, file_bytes, start, start + pages_per_task)
+                for start in range(0, count_pages(file_bytes), pages_per_task)
+            ]
+            for file_bytes in files
+        ]
+        for file_futures in futures:
+            yield _iter_results(file_futures)
+
+def _iter_results(futures):
+    # Futures were submitted in page order, so draining them in order keeps pages ordered
+    while futures:
+        yield from futures.pop(0).result()
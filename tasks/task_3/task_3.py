@@ -1,18 +1,45 @@
-import streamlit as st
-from langchain.document_loaders import PyPDFLoader
 import os
-import tempfile
-from io import BytesIO
+import sys
+if __name__ == "__main__":
+    # Make the tasks package importable when this file is run as a script
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from tasks.task_3.page_cache import PageCache
+from tasks.task_3.page_store import PageStore
+from tasks.task_3.pdf_parsing import iter_page_range, iter_pages_parallel
+from tasks import tracing
+from tasks.lazy import lazy_import
+
+st = lazy_import("streamlit")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "quizzify", "pages")
 
 class DocumentProcessor:
     """This class encapsulates the functionality for processing uploaded PDF documents
-    using Streamlit and Langchain's PyPDFLoader. It provides a method to render a
+    using Streamlit and pypdf. It provides a method to render a
     file uploader widget, process the uploaded PDF files, extract their pages,
     and display the total number of pages extracted.
+
+    Extracted pages are cached on disk by the SHA-256 of the uploaded bytes, so a
+    PDF that was already processed is not parsed again on later reruns. Pages are
+    parsed straight from the uploaded bytes, optionally across a process pool, and
+    streamed into a PageStore that keeps their text in a spill file rather than in memory.
     """
 
-    def __init__(self):
-        self.pages = []  # List to keep track of pages from all documents
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_cache_bytes=512 * 1024 * 1024,
+                 parallel=False, max_workers=None, pages_per_task=50):
+        """
+        :param cache_dir: Directory for the extracted-page cache, or None to disable caching.
+        :param max_cache_bytes: Size bound of the page cache; least recently used entries are evicted first.
+        :param parallel: Parse uncached files across a process pool instead of on the calling thread.
+        :param max_workers: Number of worker processes in parallel mode; defaults to the CPU count.
+        :param pages_per_task: In parallel mode, larger PDFs are split into page ranges of this size.
+        """
+        self.pages = PageStore()  # Keeps track of pages from all documents
+        self.document_hashes = []  # SHA-256 of each ingested file, in upload order
+        self.cache = PageCache(cache_dir, max_cache_bytes) if cache_dir else None
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
 
     def ingest_documents(self):
         """
@@ -24,38 +51,86 @@ class DocumentProcessor:
         uploaded_files = st.file_uploader("Choose a PDF file", accept_multiple_files=True, type="pdf")
 
         if uploaded_files is not None:
-            for uploaded_file in uploaded_files:
-                file_data = BytesIO(uploaded_file.read())
-                with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                    temp_file.write(file_data.getbuffer())
-                    temp_file_path = temp_file.name
-
-                # Initialize PyPDFLoader with the temporary file path
-                pdf_loader = PyPDFLoader(temp_file_path)
-
-                # Process the temporary file using PyPDFLoader
-                extracted_pages = pdf_loader.load()
+            with tracing.span("ingest_documents", files=len(uploaded_files)) as span:
+                files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+                doc_hashes = [PageCache.hash_bytes(file_bytes) for _, file_bytes in files]
 
-                # Add the extracted pages to the pages class variable
-                self.pages.extend(extracted_pages)
-
-                # Clean up by deleting the temporary file
-                os.unlink(temp_file_path)
+                # The uploader always holds the complete selection, so a rerun with the same files
+                # keeps the pages already ingested and a changed selection replaces them
+                changed = doc_hashes != self.document_hashes
+                if changed:
+                    self.reset()
+                    self.ingest_files(files, doc_hashes)
+                span.set(changed=changed, pages=len(self.pages))
 
             # Display the total number of pages processed
             st.write(f"Total pages processed: {len(self.pages)}")
+            if self.cache:
+                st.write(f"Page cache hits: {self.cache.hits}, misses: {self.cache.misses}")
 
             return self.pages
 
+    def reset(self):
+        """Discards every ingested page and document hash."""
+        self.pages.close()
+        self.pages = PageStore()
+        self.document_hashes = []
+
+    @tracing.traced("ingest_files")
+    def ingest_files(self, files, doc_hashes=None):
+        """
+        Extracts the pages of already-read PDF files and appends them to self.pages.
+        :param files: A list of (file_name, file_bytes) tuples.
+        :param doc_hashes: The SHA-256 of each file's bytes, if the caller already computed them.
+        :return: The updated self.pages store.
+        """
+        with tracing.span("ingest.hash_and_lookup", files=len(files)):
+            if doc_hashes is None:
+                doc_hashes = [PageCache.hash_bytes(file_bytes) for _, file_bytes in files]
+
+            # Reuse the pages extracted from identical uploads when available
+            cached = [self.cache.get(doc_hash) if self.cache else None for doc_hash in doc_hashes]
+            misses = [file_bytes for (_, file_bytes), pages in zip(files, cached) if pages is None]
+        tracing.count("page_cache_hits", len(files) - len(misses))
+        tracing.count("page_cache_misses", len(misses))
+
+        # Parse only the files that were not cached
+        if self.parallel and misses:
+            parsed = iter_pages_parallel(misses, max_workers=self.max_workers, pages_per_task=self.pages_per_task)
+        else:
+            parsed = (iter_page_range(file_bytes) for file_bytes in misses)
+
+        # Stream the pages into the page store, in upload order
+        for (file_name, _), doc_hash, pages in zip(files, doc_hashes, cached):
+            with tracing.span("ingest.parse_and_store", source=file_name, cached=pages is not None):
+                if pages is None:
+                    pages = (
+                        (text, {"source": file_name, "page": page_number, "doc_hash": doc_hash})
+                        for page_number, text in next(parsed)
+                    )
+                    if self.cache:
+                        pages = self.cache.write_through(doc_hash, pages)
+                else:
+                    # The same bytes may have been cached under a different file name
+                    pages = ((text, dict(metadata, source=file_name)) for text, metadata in pages)
+
+                self.pages.extend(pages)
+                self.document_hashes.append(doc_hash)
+
+        return self.pages
+
+    def iter_pages(self):
+        """Lazily yields every processed page as a LangChain Document."""
+        return iter(self.pages)
+
     def get_text(self, page_number):
         """
         Retrieve the text content of a specific page from the processed documents.
         :param page_number: The page number for which to retrieve the text content.
         :return: The text content of the specified page.
         """
-        if page_number < len(self.pages):
-            # Assuming each page is represented as a string in the self.pages list
-            return str(self.pages[page_number])
+        if 0 <= page_number < len(self.pages):
+            return self.pages.text(page_number)
         else:
             return "Page number out of range"
 
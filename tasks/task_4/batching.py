@@ -0,0 +1,53 @@
+def estimate_tokens(text):
+    """A cheap token estimate (about four characters per token) used for batch budgeting."""
+    return len(text) // 4 + 1
+
+def next_batch_end(texts, start, max_items, max_tokens, max_bytes):
+    """
+    Returns the end of the largest batch starting at `start` that stays within every budget.
+
+    A single text that exceeds a budget on its own still gets a batch of its own,
+    so the remote service, not this function, decides whether it is too large.
+
+    :param texts: A list of strings.
+    :param start: Index of the first text of the batch.
+    :param max_items: Maximum number of texts per batch.
+    :param max_tokens: Maximum estimated tokens per batch.
+    :param max_bytes: Maximum UTF-8 encoded size per batch.
+    :return: The index one past the last text of the batch.
+    """
+    tokens = 0
+    size = 0
+    stop = start
+    while stop < len(texts) and stop - start < max_items:
+        text_tokens = estimate_tokens(texts[stop])
+        text_bytes = len(texts[stop].encode("utf-8"))
+        if stop > start and (tokens + text_tokens > max_tokens or size + text_bytes > max_bytes):
+            break
+        tokens += text_tokens
+        size += text_bytes
+        stop += 1
+    return max(stop, start + 1) if start < len(texts) else start
+
+# Rate limiting and quota errors say nothing about the batch size, so they are never treated as size rejections
+_THROTTLING_ERRORS = ("ResourceExhausted", "TooManyRequests")
+_THROTTLING_MARKERS = ("429", "quota", "rate limit", "resource exhausted", "too many requests")
+_SIZE_MARKERS = (
+    "413", "too large", "payload size", "request payload", "token limit", "input token count",
+    "exceeds the maximum", "too many instances",
+)
+
+def is_request_too_large(error):
+    """
+    Returns True if `error` looks like the service rejected a request for its size
+    (a 413, or a 400 about the payload or the token limit). Quota and rate limit
+    errors (429, ResourceExhausted) are never size rejections.
+    """
+    if type(error).__name__ in _THROTTLING_ERRORS or getattr(error, "code", None) == 429:
+        return False
+    if type(error).__name__ == "RequestEntityTooLarge" or getattr(error, "code", None) == 413:
+        return True
+    message = str(error).lower()
+    if any(marker in message for marker in _THROTTLING_MARKERS):
+        return False
+    return any(marker in message for marker in _SIZE_MARKERS)
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+class EmbeddingCache:
+    """
+    A two-tier cache of embedding vectors.
+
+    Lookups go to an in-memory LRU first and then to a SQLite file on local disk, so
+    vectors survive process restarts. Entries are keyed by a hash of the model name,
+    the kind of embedding ("query" or "document", since the two are embedded with
+    different task types) and the text. Vectors are stored as float32 on disk.
+    """
+
+    def __init__(self, cache_path, max_memory_items=10_000, max_disk_items=500_000):
+        """
+        :param cache_path: Path of the SQLite database file.
+        :param max_memory_items: Maximum number of vectors kept in the in-memory LRU.
+        :param max_disk_items: Maximum number of vectors kept on disk; least recently used are evicted first.
+        """
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model_name, kind, text):
+        """Returns the cache key for `text` embedded by `model_name` as a `kind` embedding."""
+        return hashlib.sha256(f"{model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self):
+        """The fraction of lookups served from either tier."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_many(self, keys):
+        """
+        Looks up several keys at once.
+        :param keys: A list of cache keys.
+        :return: A dict mapping each key that was found to its vector.
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+            # Fall back to disk for everything the memory tier did not have
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                if rows:
+                    now = time.time()
+                    self._db.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+            if missing:
+                self._db.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        Stores several vectors at once.
+        :param items: An iterable of (key, vector) pairs.
+        """
+        items = list(items)
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items],
+            )
+            self._evict_disk()
+            self._db.commit()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_disk_items:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count - self.max_disk_items,),
+            )
@@ -0,0 +1,50 @@
+import functools
+import re
+import zlib
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+class HashingEmbeddings:
+    """
+    A fast, deterministic, fully offline embedder based on the hashing trick.
+
+    Each lowercase word and word bigram is hashed with CRC-32 to a signed position in a
+    fixed-size vector, and the resulting counts are L2-normalized. Texts that share
+    vocabulary end up close in cosine space, which is enough to exercise retrieval and
+    profile the pipeline without calling a remote model. It exposes the same
+    embed_query/embed_documents interface as VertexAIEmbeddings.
+    """
+
+    def __init__(self, dimension=768):
+        """
+        :param dimension: Length of the produced vectors.
+        """
+        self.dimension = dimension
+        self._bucket = functools.lru_cache(maxsize=1 << 16)(self._bucket_uncached)
+
+    def _bucket_uncached(self, feature):
+        h = zlib.crc32(feature.encode("utf-8"))
+        return h % self.dimension, 1.0 if (h // self.dimension) & 1 else -1.0
+
+    def _embed(self, text):
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+        if not features:
+            return [0.0] * self.dimension
+
+        indices, signs = zip(*map(self._bucket, features))
+        vector = np.bincount(indices, weights=signs, minlength=self.dimension)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_query(self, text):
+        """Returns the embedding of a single text."""
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        """Returns the embeddings of several texts, in order."""
+        return [self._embed(text) for text in texts]
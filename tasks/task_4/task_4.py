@@ -1,7 +1,30 @@
-from google.auth import credentials, default
-from google.auth.transport.requests import Request
-from google.oauth2 import service_account
-from langchain_google_vertexai import VertexAIEmbeddings
+import asyncio
+import functools
+import os
+import sys
+import threading
+if __name__ == "__main__":
+    # Make the tasks package importable when this file is run as a script
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from tasks import tracing
+from tasks.lazy import lazy_import
+from tasks.task_4.batching import is_request_too_large, next_batch_end
+from tasks.task_4.embedding_cache import EmbeddingCache
+from tasks.task_4.local_embeddings import HashingEmbeddings
+
+service_account = lazy_import("google.oauth2.service_account")
+vertexai = lazy_import("langchain_google_vertexai")
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "quizzify", "embeddings.sqlite3")
+
+# Process-wide registry of shared clients, see EmbeddingClient.shared()
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def load_credentials(key_file_path):
+    """Loads the service account key file once per process and reuses the credentials, and their refreshed tokens."""
+    return service_account.Credentials.from_service_account_file(key_file_path)
 
 class EmbeddingClient:
     """
@@ -28,33 +51,205 @@ class EmbeddingClient:
     - Implement the embed_query method to use the embedding client to retrieve embeddings for the given query.
 
     Note: The 'embed_documents' method has been provided for you. Focus on correctly initializing the class and implementing the embed_query method.
+
+    Caching:
+    Embeddings are cached in memory and on disk by (model_id, hash of text), so only texts that have
+    never been embedded before reach Vertex. Pass cache_path=None to disable the cache.
+
+    Batching:
+    Misses are sent in batches bounded by item count, estimated tokens and bytes. A batch rejected as too
+    large is split in half and retried, and later batches use the smaller size. aembed_documents runs up
+    to max_concurrency batches at once while preserving the order of the input.
+
+    Sharing:
+    EmbeddingClient.shared(**config) returns one thread-safe client per (model_name, project, location,
+    key_file_path), so Streamlit reruns and sessions reuse the same credentials and Vertex connections.
+
+    Backends:
+    backend="vertex" (the default) uses VertexAIEmbeddings. backend="hashing" uses a local, deterministic
+    HashingEmbeddings of the given dimension and needs no project, location or key file, so the pipeline
+    can run and be profiled fully offline.
+
+    model_id identifies the vectors the client produces (backend plus model name, or plus dimension
+    for hashing). It is part of every cache key, so backends and models never read each other's vectors.
     """
 
-    def __init__(self, model_name, project, location, key_file_path):
-        # Initialize the VertexAIEmbeddings client with the given parameters and service account key file
-        self.client = self._initialize_client(model_name, project, location, key_file_path)
+    def __init__(self, model_name, project=None, location=None, key_file_path=None,
+                 cache_path=DEFAULT_CACHE_PATH, max_memory_items=10_000, max_disk_items=500_000,
+                 max_batch_items=250, max_batch_tokens=20_000, max_batch_bytes=1_000_000, max_concurrency=4,
+                 backend="vertex", dimension=768):
+        # Initialize the embedding client with the given parameters and service account key file
+        self.model_name = model_name
+        if backend == "vertex":
+            self.client = self._initialize_client(model_name, project, location, key_file_path)
+            self.model_id = f"vertex/{model_name}"
+        elif backend == "hashing":
+            self.client = HashingEmbeddings(dimension)
+            self.model_id = f"hashing/{dimension}"
+        else:
+            raise ValueError(f"Unknown embedding backend: {backend}")
+        self.cache = EmbeddingCache(cache_path, max_memory_items, max_disk_items) if cache_path else None
+
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_bytes = max_batch_bytes
+        self.max_concurrency = max_concurrency
+
+    @classmethod
+    def shared(cls, model_name, project=None, location=None, key_file_path=None, **kwargs):
+        """
+        Returns the process-wide client for the given configuration, creating it on first use.
+        Extra keyword arguments, such as the backend, are part of the configuration.
+        """
+        key = (model_name, project, location, key_file_path, tuple(sorted(kwargs.items())))
+        client = _shared_clients.get(key)
+        if client is None:
+            with _shared_clients_lock:
+                client = _shared_clients.get(key)
+                if client is None:
+                    client = _shared_clients[key] = cls(model_name, project, location, key_file_path, **kwargs)
+        return client
 
     def _initialize_client(self, model_name, project, location, key_file_path):
-        # Load the service account key file
-        credentials = service_account.Credentials.from_service_account_file(key_file_path)
+        # Load the service account key file, reusing credentials already loaded by this process
+        credentials = load_credentials(key_file_path)
 
         # Initialize the VertexAIEmbeddings client with the provided parameters and credentials
-        client = VertexAIEmbeddings(model_name=model_name, project=project, location=location, credentials=credentials)
+        client = vertexai.VertexAIEmbeddings(model_name=model_name, project=project, location=location, credentials=credentials)
         return client
 
     def embed_query(self, query):
         """Uses the embedding client to retrieve embeddings for the given query."""
-        vectors = self.client.embed_query(query)
+        if self.cache is None:
+            return self.client.embed_query(query)
+
+        key = EmbeddingCache.make_key(self.model_id, "query", query)
+        vectors = self.cache.get_many([key]).get(key)
+        if vectors is None:
+            vectors = self.client.embed_query(query)
+            self.cache.put_many([(key, vectors)])
         return vectors
 
+    def embed_queries(self, queries):
+        """Retrieve query embeddings for several queries, fetching the cache misses in a single request."""
+        keys = [EmbeddingCache.make_key(self.model_id, "query", query) for query in queries]
+        vectors = self.cache.get_many(keys) if self.cache else {}
+
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key not in vectors:
+                missing.setdefault(key, query)
+        tracing.count("embedding_cache_hits", len(keys) - len(missing), kind="query")
+        tracing.count("embedding_cache_misses", len(missing), kind="query")
+        if missing:
+            texts = list(missing.values())
+            tracing.count("embedding_requests", kind="query")
+            with tracing.span("embed.queries", texts=len(texts)):
+                if not isinstance(self.client, HashingEmbeddings):
+                    embedded = self.client.embed(texts, embeddings_task_type="RETRIEVAL_QUERY")
+                else:
+                    embedded = [self.client.embed_query(text) for text in texts]
+            new_vectors = list(zip(missing.keys(), embedded))
+            if self.cache:
+                self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return [vectors[key] for key in keys]
+
     def embed_documents(self, documents):
-        """Retrieve embeddings for multiple documents."""
+        """Retrieve embeddings for multiple documents, fetching only the cache misses in batches."""
         try:
-            return self.client.embed_documents(documents)
+            keys, vectors, missing = self._lookup(documents)
+            if missing:
+                texts = list(missing.values())
+                embedded = []
+                start = 0
+                while start < len(texts):
+                    stop = self._next_batch_end(texts, start)
+                    embedded.extend(self._embed_batch(texts[start:stop]))
+                    start = stop
+                self._store(missing, embedded, vectors)
+            return [vectors[key] for key in keys]
         except AttributeError:
             print("Method embed_documents not defined for the client.")
             return None
 
+    async def aembed_query(self, query):
+        """Async version of embed_query; the request runs in a worker thread."""
+        return await asyncio.to_thread(self.embed_query, query)
+
+    async def aembed_documents(self, documents):
+        """
+        Async version of embed_documents that keeps up to max_concurrency batches in flight.
+        The returned vectors are in the same order as `documents`.
+        """
+        keys, vectors, missing = await asyncio.to_thread(self._lookup, documents)
+        if missing:
+            texts = list(missing.values())
+            results = {}
+            cursor = 0
+
+            async def worker():
+                nonlocal cursor
+                # Batches are carved off lazily, so they pick up a max_batch_items that shrank meanwhile
+                while cursor < len(texts):
+                    start = cursor
+                    cursor = self._next_batch_end(texts, start)
+                    results[start] = await asyncio.to_thread(self._embed_batch, texts[start:cursor])
+
+            await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+            embedded = [vector for start in sorted(results) for vector in results[start]]
+            await asyncio.to_thread(self._store, missing, embedded, vectors)
+        return [vectors[key] for key in keys]
+
+    def _lookup(self, documents):
+        """
+        Returns the cache key of every document, the vectors already cached, and an
+        ordered dict of the distinct texts that still have to be embedded.
+        """
+        keys = [EmbeddingCache.make_key(self.model_id, "document", text) for text in documents]
+        vectors = self.cache.get_many(keys) if self.cache else {}
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, documents):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        tracing.count("embedding_cache_hits", len(keys) - len(missing), kind="document")
+        tracing.count("embedding_cache_misses", len(missing), kind="document")
+        return keys, vectors, missing
+
+    def _store(self, missing, embedded, vectors):
+        new_vectors = list(zip(missing.keys(), embedded))
+        if self.cache:
+            self.cache.put_many(new_vectors)
+        vectors.update(new_vectors)
+
+    def _next_batch_end(self, texts, start):
+        return next_batch_end(texts, start, self.max_batch_items, self.max_batch_tokens, self.max_batch_bytes)
+
+    def _embed_batch(self, texts):
+        """Embeds one batch, halving it and shrinking max_batch_items when it is rejected as too large."""
+        try:
+            tracing.count("embedding_requests", kind="document")
+            with tracing.span("embed.batch", texts=len(texts)):
+                return self.client.embed_documents(texts)
+        except AttributeError:
+            raise
+        except Exception as error:
+            if len(texts) == 1 or not is_request_too_large(error):
+                raise
+            tracing.count("embedding_retries")
+            half = len(texts) // 2
+            self.max_batch_items = max(1, min(self.max_batch_items, half))
+            print(f"Embedding batch of {len(texts)} rejected as too large, retrying in batches of {half}.")
+            return self._embed_batch(texts[:half]) + self._embed_batch(texts[half:])
+
+    @property
+    def cache_hit_rate(self):
+        """The fraction of embedding lookups served from the cache."""
+        return self.cache.hit_rate if self.cache else 0.0
+
 if __name__ == "__main__":
     model_name = "textembedding-gecko@003"
     project = "radica-ai"
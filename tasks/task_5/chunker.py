@@ -0,0 +1,77 @@
+from tasks.lazy import lazy_import
+
+lc_documents = lazy_import("langchain_core.documents")
+
+class OffsetTextSplitter:
+    """
+    A streaming text splitter that sizes chunks by an embedding token budget and
+    records where every chunk came from.
+
+    Chunk boundaries are found with rfind over the page text itself, preferring
+    paragraph breaks, then line breaks, then spaces, so the only string copy made
+    is the final slice of each chunk. Every chunk carries its source, page and the
+    [start, end) character offsets of the slice within the page text.
+    """
+
+    def __init__(self, chunk_tokens=250, overlap_tokens=25, chars_per_token=4, separators=("\n\n", "\n", " ")):
+        """
+        :param chunk_tokens: Maximum estimated tokens per chunk; keep it under the embedding model's input limit.
+        :param overlap_tokens: Estimated tokens shared by consecutive chunks.
+        :param chars_per_token: Characters per token used to turn the budget into a character count.
+        :param separators: Preferred break points, best first.
+        """
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens.")
+        self.max_chars = chunk_tokens * chars_per_token
+        self.overlap_chars = overlap_tokens * chars_per_token
+        self.separators = separators
+
+    def split_offsets(self, text):
+        """Yields the (start, end) offsets of the chunks of `text`, with surrounding whitespace trimmed."""
+        length = len(text)
+        position = 0
+        while position < length:
+            limit = position + self.max_chars
+            if limit >= length:
+                end = length
+            else:
+                # Break at the best separator in the second half of the window, else cut hard
+                end = limit
+                floor = position + self.max_chars // 2
+                for separator in self.separators:
+                    index = text.rfind(separator, floor, limit)
+                    if index != -1:
+                        end = index + len(separator)
+                        break
+
+            start = position
+            while start < end and text[start].isspace():
+                start += 1
+            stop = end
+            while stop > start and text[stop - 1].isspace():
+                stop -= 1
+            if stop > start:
+                yield start, stop
+
+            if end >= length:
+                break
+
+            # Start the next chunk inside the overlap, on a word boundary when there is one
+            next_position = max(end - self.overlap_chars, position + 1)
+            space = text.find(" ", next_position, end)
+            position = space + 1 if space != -1 else next_position
+
+    def split_text(self, text):
+        """Returns the chunks of `text` as strings."""
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def split_documents(self, documents):
+        """
+        Lazily splits an iterable of Documents, such as DocumentProcessor.iter_pages().
+        :return: A generator of chunk Documents whose metadata holds the page's metadata plus "start" and "end".
+        """
+        for document in documents:
+            text = document.page_content
+            for start, end in self.split_offsets(text):
+                metadata = dict(document.metadata, start=start, end=end)
+                yield lc_documents.Document(page_content=text[start:end], metadata=metadata)
@@ -1,53 +1,166 @@
 import sys
 import os
-import streamlit as st
+import hashlib
+from typing import TYPE_CHECKING
 
-sys.path.append(os.path.abspath('../../'))
+if __name__ == "__main__":
+    # Make the tasks package importable when this file is run as a script
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from tasks import tracing
+from tasks.lazy import lazy_import
 from tasks.task_3.task_3 import DocumentProcessor
 from tasks.task_4.task_4 import EmbeddingClient
 
-# Import Task libraries
-from langchain_core.documents import Document
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.vectorstores import Chroma
+# Import Task libraries, deferred to their first use
+from tasks.task_5.chunker import OffsetTextSplitter
+from tasks.task_5.vector_index import NumpyVectorIndex
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+st = lazy_import("streamlit")
+lc_documents = lazy_import("langchain_core.documents")
+vectorstores = lazy_import("langchain_community.vectorstores")
+
+DEFAULT_PERSIST_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "quizzify", "chroma")
 
 class ChromaCollectionCreator:
-    def __init__(self, processor, embed_model):
+    def __init__(self, processor, embed_model, persist_directory=DEFAULT_PERSIST_DIRECTORY, collection_name="quizzify",
+                 backend="auto", max_numpy_chunks=5000, headless=False):
         """
         Initializes the ChromaCollectionCreator with a DocumentProcessor instance and embeddings configuration.
         :param processor: An instance of DocumentProcessor that has processed documents.
         :param embeddings_config: An embedding client for embedding documents.
+        :param persist_directory: Directory of the persistent Chroma collection, or None for an in-memory one.
+        :param collection_name: Prefix of the Chroma collection chunks are upserted into. Each embedding
+                                model gets its own collection, see persistent_collection_name().
+        :param backend: "chroma", "numpy" for an in-process NumpyVectorIndex, or "auto" to use the
+                        NumPy index up to max_numpy_chunks chunks and Chroma above that.
+        :param max_numpy_chunks: Corpus size above which "auto" switches to Chroma.
+        :param headless: Print success and error messages instead of showing them with Streamlit.
         """
         self.processor = processor      # This will hold the DocumentProcessor from Task 3
         self.embed_model = embed_model  # This will hold the EmbeddingClient from Task 4
         self.db = None                  # This will hold the Chroma collection
+        self.document_hashes = []       # Hashes of the documents the collection was built from
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.backend = backend
+        self.max_numpy_chunks = max_numpy_chunks
+        self.headless = headless
+        self.version = 0                # Bumped whenever the collection changes
+        self._context_cache = {}        # (version, topic, k) -> retrieved context
     
+    @tracing.traced("create_chroma_collection")
     def create_chroma_collection(self):
        
         
         # Step 1: Check for processed documents
         if len(self.processor.pages) == 0:
-            st.error("No documents found!", icon="🚨")
+            self._feedback("error", "No documents found!", icon="🚨")
             return
 
         # Step 2: Split documents into text chunks
-        # Use a TextSplitter from Langchain to split the documents into smaller text chunks
-        # https://python.langchain.com/docs/modules/data_connection/document_transformers/character_text_splitter
-        splitter = CharacterTextSplitter(separator='\n', chunk_size=1000, chunk_overlap=100)
-        texts = splitter.split_documents(self.processor.pages)
+        # The pages are streamed through a splitter that sizes chunks for the embedding model's
+        # token limit and records each chunk's (source, page, start, end) offsets
+        splitter = OffsetTextSplitter(chunk_tokens=250, overlap_tokens=25)
+        with tracing.span("collection.split") as span:
+            texts = list(splitter.split_documents(self.processor.iter_pages()))
+            span.set(chunks=len(texts))
         
-        if texts is not None:
-            st.success(f"Successfully split pages to {len(texts)} documents!", icon="✅")
+        if not texts:
+            self._feedback("error", "No text found in the documents!", icon="🚨")
+            return
+        self._feedback("success", f"Successfully split pages to {len(texts)} documents!", icon="✅")
+
+        chunks = {self.chunk_id(text): text for text in texts}
+        # Searches stay on these documents even if the processor moves on to other uploads
+        self.document_hashes = list(dict.fromkeys(self.processor.document_hashes))
+
+        # Small corpora are searched in process, where Chroma's machinery costs more than the search
+        if self.backend == "numpy" or (self.backend == "auto" and len(chunks) <= self.max_numpy_chunks):
+            with tracing.span("collection.embed_and_index", backend="numpy", chunks=len(chunks)):
+                self.db = NumpyVectorIndex(self.embed_model)
+                self.db.add_documents(list(chunks.values()), ids=list(chunks))
+            self._collection_changed()
+            if self.db:
+                self._feedback("success", f"Successfully created in-memory collection of {len(self.db)} chunks!", icon="✅")
+            else:
+                self._feedback("error", "Failed to create Chroma Collection!", icon="🚨")
+            return
+
+        # Step 3: Open the Chroma Collection, reusing whatever a previous run persisted
+        with tracing.span("collection.open", persistent=self.persist_directory is not None):
+            self.db = vectorstores.Chroma(
+                collection_name=self.persistent_collection_name(),
+                embedding_function=self.embed_model,
+                persist_directory=self.persist_directory,
+            )
+
+        # Step 4: Upsert only the chunks the collection has not seen yet, keyed by content hash
+        ids = list(chunks)
+        existing = set()
+        with tracing.span("collection.lookup_existing", chunks=len(ids)):
+            for start in range(0, len(ids), 5000):
+                existing.update(self.db.get(ids=ids[start:start + 5000], include=[])["ids"])
+        new_ids = [chunk_id for chunk_id in ids if chunk_id not in existing]
+        with tracing.span("collection.embed_and_index", backend="chroma", chunks=len(new_ids)):
+            for start in range(0, len(new_ids), 5000):
+                batch_ids = new_ids[start:start + 5000]
+                self.db.add_documents([chunks[chunk_id] for chunk_id in batch_ids], ids=batch_ids)
+        self._collection_changed()
 
-        # Step 3: Create the Chroma Collection
-        self.db = Chroma.from_documents(texts, self.embed_model)
-        
         if self.db:
-            st.success("Successfully created Chroma Collection!", icon="✅")
+            self._feedback(
+                "success",
+                f"Successfully created Chroma Collection! Added {len(new_ids)} new chunks, "
+                f"skipped {len(existing)} already indexed.",
+                icon="✅",
+            )
         else:
-            st.error("Failed to create Chroma Collection!", icon="🚨")
-    
-    def query_chroma_collection(self, query) -> Document:
+            self._feedback("error", "Failed to create Chroma Collection!", icon="🚨")
+
+    def _feedback(self, level, message, icon):
+        """Shows a Streamlit success or error message, or prints it when headless."""
+        if self.headless:
+            print(message)
+        else:
+            getattr(st, level)(message, icon=icon)
+
+    def persistent_collection_name(self):
+        """
+        Returns the name of the Chroma collection for the embedding model: the collection_name prefix
+        followed by a digest of the model identity, so vectors of different models or dimensions are
+        never mixed in, or queried from, the same collection.
+        """
+        model_id = getattr(self.embed_model, "model_id", type(self.embed_model).__name__)
+        digest = hashlib.sha256(model_id.encode("utf-8")).hexdigest()[:16]
+        return f"{self.collection_name}-{digest}"
+
+    def _collection_changed(self):
+        """Invalidates every context retrieved from the previous version of the collection."""
+        self.version += 1
+        self._context_cache.clear()
+
+    @staticmethod
+    def chunk_id(chunk):
+        """
+        Returns the id of a chunk: a hash of its content and of the document it came from,
+        so the same text in two different documents is indexed, and filtered, separately.
+        """
+        doc_hash = chunk.metadata.get("doc_hash", "")
+        return hashlib.sha256(f"{doc_hash}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+
+    def _document_filter(self):
+        """Restricts searches to chunks of the documents the collection was built from."""
+        if isinstance(self.db, NumpyVectorIndex):
+            return None  # The in-process index only ever holds the collection's documents
+        if len(self.document_hashes) == 1:
+            return {"doc_hash": self.document_hashes[0]}
+        return {"doc_hash": {"$in": self.document_hashes}}
+
+    @tracing.traced("query_chroma_collection")
+    def query_chroma_collection(self, query) -> "Document":
         """
         Queries the created Chroma collection for documents similar to the query.
         :param query: The query string to search for in the Chroma collection.
@@ -55,13 +168,80 @@ class ChromaCollectionCreator:
         Returns the first matching document from the collection with similarity score.
         """
         if self.db:
-            docs = self.db.similarity_search_with_relevance_scores(query)
+            docs = self.db.similarity_search_with_relevance_scores(query, filter=self._document_filter())
             if docs:
                 return docs[0]
             else:
-                st.error("No matching documents found!", icon="🚨")
+                self._feedback("error", "No matching documents found!", icon="🚨")
+        else:
+            self._feedback("error", "Chroma Collection has not been created!", icon="🚨")
+
+    def query_chroma_collection_batch(self, queries, k=4, score_threshold=None):
+        """
+        Queries the collection for several query strings in one round trip.
+        All queries are embedded in a single request and searched in a single call.
+        :param queries: A list of query strings.
+        :param k: Number of documents to return per query.
+        :param score_threshold: Optional minimum relevance score of returned documents.
+
+        Returns, for each query, a list of (document, relevance score) pairs, best first.
+        """
+        if not self.db:
+            self._feedback("error", "Chroma Collection has not been created!", icon="🚨")
+            return None
+        if not queries:
+            return []
+
+        with tracing.span("retrieve.embed_queries", queries=len(queries)):
+            query_vectors = self.embed_model.embed_queries(queries)
+        with tracing.span("retrieve.search", queries=len(queries), k=k):
+            results = self._search(query_vectors, k)
+
+        if score_threshold is not None:
+            results = [[(doc, score) for doc, score in result if score >= score_threshold] for result in results]
+        return results
+
+    def _search(self, query_vectors, k):
+        """Returns the k nearest chunks of each query vector as (document, relevance score) pairs."""
+        if isinstance(self.db, NumpyVectorIndex):
+            results = self.db.search_by_vectors(query_vectors, k)
         else:
-            st.error("Chroma Collection has not been created!", icon="🚨")
+            response = self.db._collection.query(
+                query_embeddings=query_vectors,
+                n_results=k,
+                where=self._document_filter(),
+                include=["documents", "metadatas", "distances"],
+            )
+            relevance = self.db._select_relevance_score_fn()
+            results = [
+                [
+                    (lc_documents.Document(page_content=text, metadata=metadata or {}), relevance(distance))
+                    for text, metadata, distance in zip(texts, metadatas, distances)
+                ]
+                for texts, metadatas, distances in zip(
+                    response["documents"], response["metadatas"], response["distances"]
+                )
+            ]
+        return results
+
+    @tracing.traced("retrieve_context")
+    def retrieve_context(self, topic, k=1):
+        """
+        Returns the text of the k chunks most relevant to `topic`, joined by blank lines.
+        Results are cached per (collection version, topic, k), so repeated questions on
+        the same topic search the collection only once until it changes.
+        """
+        key = (self.version, topic, k)
+        context = self._context_cache.get(key)
+        tracing.count("context_cache_hits" if context is not None else "context_cache_misses")
+        if context is None:
+            results = self.query_chroma_collection_batch([topic], k)
+            if not results:
+                return ""
+            context = "\n\n".join(doc.page_content for doc, _ in results[0])
+            self._context_cache[key] = context
+        return context
+
     def as_retriever(self):
         """
         Returns the Chroma Collection as a retriever.
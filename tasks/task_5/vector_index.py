@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+
+class NumpyVectorIndex:
+    """
+    An in-process vector index for small corpora.
+
+    Embeddings are L2-normalized and kept in one contiguous float32 matrix, so cosine
+    similarity against every chunk is a single matrix multiply and the top k are picked
+    with argpartition. Any number of queries can be answered in one call. The search
+    methods mirror the subset of LangChain's Chroma API used by ChromaCollectionCreator,
+    and relevance scores are computed the same way Chroma's default L2 space does, so
+    score thresholds carry over between the two.
+    """
+
+    def __init__(self, embedding_function):
+        """
+        :param embedding_function: An object with embed_documents and embed_query methods.
+        """
+        self.embedding_function = embedding_function
+        self.documents = []
+        self.ids = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add_documents(self, documents, ids=None):
+        """
+        Embeds and appends documents to the index.
+        :param documents: A list of LangChain Documents.
+        :param ids: Optional ids of the documents, in the same order.
+        """
+        if not documents:
+            return
+        vectors = self._normalize(self.embedding_function.embed_documents([doc.page_content for doc in documents]))
+        self._matrix = vectors if not self.documents else np.vstack([self._matrix, vectors])
+        self.documents.extend(documents)
+        self.ids.extend(ids if ids is not None else range(len(self.ids), len(self.ids) + len(documents)))
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None, **kwargs):
+        """Returns the k documents most similar to `query` as (document, relevance score) pairs."""
+        return self.search_by_vectors([self.embedding_function.embed_query(query)], k, filter)[0]
+
+    def search_by_vectors(self, query_vectors, k=4, filter=None):
+        """
+        Answers several queries at once.
+        :param query_vectors: A list of query embeddings.
+        :param k: Number of results per query.
+        :param filter: Optional metadata filter of the form {key: value} or {key: {"$in": [values]}}.
+        :return: For each query, a list of up to k (document, relevance score) pairs, best first.
+        """
+        if not self.documents or not len(query_vectors):
+            return [[] for _ in query_vectors]
+
+        candidates = self._filter_rows(filter)
+        matrix = self._matrix if candidates is None else self._matrix[candidates]
+        if not len(matrix):
+            return [[] for _ in query_vectors]
+
+        similarities = self._normalize(query_vectors) @ matrix.T
+        k = min(k, similarities.shape[1])
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        if candidates is not None:
+            top = candidates[top]
+        return [
+            [(self.documents[row], self._relevance(score)) for row, score in zip(rows, scores)]
+            for rows, scores in zip(top.tolist(), top_scores.tolist())
+        ]
+
+    def _filter_rows(self, filter):
+        if not filter:
+            return None
+        rows = []
+        for row, doc in enumerate(self.documents):
+            for key, condition in filter.items():
+                value = doc.metadata.get(key)
+                if isinstance(condition, dict):
+                    if value not in condition.get("$in", ()):
+                        break
+                elif value != condition:
+                    break
+            else:
+                rows.append(row)
+        return np.array(rows, dtype=np.intp)
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms)
+
+    @staticmethod
+    def _relevance(similarity):
+        # Chroma's default space returns the squared L2 distance, which is 2 - 2 * cosine for
+        # unit vectors, and LangChain maps it to a relevance of 1 - distance / sqrt(2)
+        return 1.0 - (2.0 - 2.0 * similarity) / math.sqrt(2)
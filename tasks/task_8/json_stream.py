@@ -0,0 +1,71 @@
+import json
+
+class JsonObjectStreamParser:
+    """
+    Incrementally extracts top-level JSON objects from streamed text.
+
+    Text is fed in arbitrary chunks as it arrives from the LLM. Every time a balanced
+    {...} object closes it is decoded and returned, so the items of a JSON array can be
+    used before the rest of the response has been generated. Anything outside of the
+    objects, such as the array brackets, commas or markdown code fences, is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0    # Next character of the buffer to scan
+        self._start = None    # Buffer index where the current top-level object started
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.failures = 0     # Balanced objects that still failed to decode
+
+    def feed(self, chunk):
+        """
+        Consumes the next chunk of text.
+        :param chunk: A string continuing the text fed so far.
+        :return: A list of the objects completed by this chunk, decoded to dicts.
+        """
+        self._buffer += chunk
+        objects = []
+        buffer = self._buffer
+        for index in range(self._position, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                if self._depth:
+                    self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._depth == 0:
+                    self._start = index
+                if self._depth or char == "{":
+                    self._depth += 1
+            elif char in "}]" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        objects.append(json.loads(buffer[self._start:index + 1]))
+                    except json.JSONDecodeError:
+                        self.failures += 1
+                    self._start = None
+
+        # Drop everything that can no longer be part of an object
+        keep_from = self._start if self._start is not None else len(buffer)
+        self._buffer = buffer[keep_from:]
+        self._position = len(buffer) - keep_from
+        if self._start is not None:
+            self._start = 0
+        return objects
+
+def extract_json_object(text):
+    """
+    Returns the first balanced JSON object in `text`, decoded, or None if there is none.
+    Markdown code fences and any prose around the object are ignored.
+    """
+    objects = JsonObjectStreamParser().feed(text)
+    return objects[0] if objects else None
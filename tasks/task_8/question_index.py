@@ -0,0 +1,108 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Duplicate threshold of QuestionIndex, QuizGenerator and QuestionPool
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+
+# Words that carry no subject matter. They are left out of the word sets compared for near-duplicates,
+# or "What is the capital of Germany?" and "What is the capital of France?" would share most of their words.
+# The last line holds what is left of contractions, such as the s of "What's".
+STOPWORDS = frozenset("""
+    a about above after again against all am an and any are as at be because been before being below between
+    both but by can could did do does doing down during each few for from further had has have having he her
+    here hers him his how i if in into is it its itself just may me might more most must my no nor not now of
+    off on once only or other our out over own same shall she should so some such than that the their theirs
+    them then there these they this those through to too under until up very was we were what when where which
+    while who whom whose why will with would you your
+    d ll m re s t ve
+""".split())
+
+class QuestionIndex:
+    """
+    An index of question texts for O(1) duplicate checks.
+
+    Exact duplicates are caught by hashing the normalized text (lowercase words only,
+    so punctuation, case and spacing do not matter). Paraphrases are caught with
+    MinHash signatures over the question's content words (its words minus STOPWORDS),
+    bucketed by locality-sensitive hashing: only questions sharing a band bucket are
+    compared, and a candidate counts as a duplicate when the Jaccard similarity of the
+    two content word sets reaches `threshold`.
+    """
+
+    def __init__(self, threshold=DEFAULT_SIMILARITY_THRESHOLD, num_perm=64, bands=16, seed=1):
+        """
+        :param threshold: Jaccard similarity of content word sets at or above which two questions are near-duplicates.
+        :param num_perm: Number of MinHash permutations.
+        :param bands: Number of LSH bands; num_perm must be divisible by it. More bands find more candidates.
+        :param seed: Seed of the random permutations.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands.")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+        self._exact = set()
+        self._word_sets = []
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+
+    def __len__(self):
+        return len(self._word_sets)
+
+    @staticmethod
+    def _words(text):
+        return _WORD_PATTERN.findall(text.lower())
+
+    @staticmethod
+    def _content_words(words):
+        """Returns the set of words that are not stopwords, or of all words if every word is one."""
+        content = {word for word in words if word not in STOPWORDS}
+        return content or set(words)
+
+    def _signature(self, words):
+        hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) & _MERSENNE_PRIME for word in words), dtype=np.uint64)
+        return ((self._a * hashes + self._b) % _MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def is_duplicate(self, text):
+        """Returns True if `text` matches, or nearly matches, a question already in the index."""
+        words = self._words(text)
+        if hashlib.sha1(" ".join(words).encode("utf-8")).digest() in self._exact:
+            return True
+        if not words:
+            return False
+
+        word_set = self._content_words(words)
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(self._signature(word_set))):
+            candidates.update(bucket.get(key, ()))
+        for candidate in candidates:
+            other = self._word_sets[candidate]
+            if len(word_set & other) / len(word_set | other) >= self.threshold:
+                return True
+        return False
+
+    def add(self, text):
+        """Adds a question text to the index."""
+        words = self._words(text)
+        self._exact.add(hashlib.sha1(" ".join(words).encode("utf-8")).digest())
+
+        word_set = self._content_words(words)
+        position = len(self._word_sets)
+        self._word_sets.append(word_set)
+        if word_set:
+            for bucket, key in zip(self._buckets, self._band_keys(self._signature(word_set))):
+                bucket[key].append(position)
@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+from tasks.task_8.question_index import DEFAULT_SIMILARITY_THRESHOLD, QuestionIndex
+from tasks.task_8.task_8 import QuizGenerator
+
+# Process-wide pools, see QuestionPool.for_topic()
+_pools = OrderedDict()
+_pools_lock = threading.Lock()
+
+class QuestionPool:
+    """
+    A pool of validated questions for one collection and topic, kept topped up by a background thread.
+
+    Once a collection is built, the pool's worker generates questions with a QuizGenerator until
+    `target_size` questions are waiting, and generates more whenever questions are taken. A quiz
+    is then served from the pool instantly. Questions are deduplicated against everything the pool
+    has ever held, so consecutive quizzes on the same topic do not repeat each other. With a
+    response cache, every generator of the pool excludes the cached responses the pool was already
+    served, so a full cache cannot keep replaying questions the pool rejects as duplicates.
+    """
+
+    def __init__(self, vectorstore, topic, target_size=20, max_failed_rounds=3, **generator_kwargs):
+        """
+        :param vectorstore: The ChromaCollectionCreator to generate questions from.
+        :param topic: The topic of the questions.
+        :param target_size: Number of questions the worker keeps ready.
+        :param max_failed_rounds: Consecutive generation rounds without a new question after which the worker gives up.
+        :param generator_kwargs: Extra QuizGenerator arguments, such as concurrency or response_cache.
+        """
+        self.vectorstore = vectorstore
+        self.topic = topic
+        self.target_size = target_size
+        self.max_failed_rounds = max_failed_rounds
+        self.generator_kwargs = generator_kwargs
+
+        self._questions = []
+        self._index = QuestionIndex(generator_kwargs.get("similarity_threshold", DEFAULT_SIMILARITY_THRESHOLD))
+        self._served_slots = defaultdict(set)  # Response cache slots used by any round, see QuizGenerator
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._exhausted = False
+        self._thread = None
+        self.last_error = None  # The last exception raised by a generation round
+
+    @classmethod
+    def for_topic(cls, vectorstore, topic, max_pools=16, **kwargs):
+        """
+        Returns the process-wide, already started pool for the documents of `vectorstore` and `topic`,
+        creating it on first use. Pools are keyed by the hashes of the documents the collection was built
+        from, so they are shared across sessions that uploaded the same documents, and keep generating
+        from those documents after the session that created them uploads others. The least recently used pools are stopped beyond `max_pools`.
+        """
+        key = (tuple(sorted(vectorstore.document_hashes)), topic)
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool._exhausted:
+                pool = _pools[key] = cls(vectorstore, topic, **kwargs)
+                pool.start()
+            _pools.move_to_end(key)
+            while len(_pools) > max_pools:
+                _, evicted = _pools.popitem(last=False)
+                evicted.stop()
+        return pool
+
+    def __len__(self):
+        return len(self._questions)
+
+    def start(self):
+        """Starts the background worker."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"question-pool-{self.topic}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Asks the background worker to stop after its current generation round."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def take(self, count, timeout=None):
+        """
+        Removes and returns up to `count` questions.
+        :param count: The number of questions wanted.
+        :param timeout: Seconds to wait for `count` questions to be ready; None waits until they are or
+                        the worker gives up, 0 returns immediately with whatever is ready.
+        :return: A list of question dictionaries, shorter than `count` if not enough were ready in time.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(self._questions) >= count or self._exhausted or self._stopped, timeout
+            )
+            taken, self._questions = self._questions[:count], self._questions[count:]
+            self._condition.notify_all()
+        return taken
+
+    def iter_take(self, count, timeout=None):
+        """
+        Removes and yields up to `count` questions one at a time, each as soon as it is ready,
+        so a quiz can start while the rest of it is still being generated.
+        :param timeout: Seconds to wait for each question; None waits until it is ready or the worker gives up.
+        """
+        for _ in range(count):
+            taken = self.take(1, timeout)
+            if not taken:
+                return
+            yield taken[0]
+
+    def _run(self):
+        failed_rounds = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._questions) < self.target_size or self._stopped)
+                if self._stopped:
+                    return
+                missing = self.target_size - len(self._questions)
+
+            # Questions join the pool one by one as the generator validates them
+            added = 0
+            try:
+                generator = QuizGenerator(
+                    self.topic, min(missing, 10), self.vectorstore, served_slots=self._served_slots,
+                    **self.generator_kwargs
+                )
+                for question in generator.iter_quiz():
+                    with self._condition:
+                        if not self._index.is_duplicate(question["question"]):
+                            self._index.add(question["question"])
+                            self._questions.append(question)
+                            added += 1
+                            self._condition.notify_all()
+            except Exception as error:
+                print("Question pool generation failed:", error)
+                self.last_error = error
+
+            with self._condition:
+                failed_rounds = 0 if added else failed_rounds + 1
+                if failed_rounds >= self.max_failed_rounds:
+                    print(f"Question pool for '{self.topic}' stopped after {failed_rounds} rounds without new questions.")
+                    self._exhausted = True
+                self._condition.notify_all()
+                if self._exhausted:
+                    return
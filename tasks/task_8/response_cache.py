@@ -0,0 +1,115 @@
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "quizzify", "responses.sqlite3")
+
+class ResponseCache:
+    """
+    A disk-backed cache of LLM responses, keyed by a hash of (model, temperature, rendered prompt).
+
+    Every key holds a pool of up to `diversity` different responses. Lookups miss until
+    the pool holds `min_responses`; after that, while the pool is still filling up, a lookup
+    is served with a probability equal to how full the pool is, and otherwise misses so that
+    a new response gets generated and added. Once it is full, every lookup is served from
+    it. Responses are served least recently served first, so repeated quizzes rotate
+    through different questions instead of always replaying the same ones. Callers
+    can exclude the slots they already used, so one quiz never receives the same cached
+    response twice. Responses expire after `ttl_seconds`, and the least recently used are
+    evicted when the stored responses exceed `max_bytes`.
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, ttl_seconds=7 * 24 * 3600, max_bytes=64 * 1024 * 1024, diversity=8,
+                 min_responses=2):
+        """
+        :param cache_path: Path of the SQLite database file.
+        :param ttl_seconds: Age after which a response is no longer served.
+        :param max_bytes: Upper bound on the total size of the stored responses.
+        :param diversity: Number of different responses kept, and rotated through, per key.
+        :param min_responses: Number of responses a pool needs before any lookup is served from it.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.diversity = diversity
+        self.min_responses = min(min_responses, diversity)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT NOT NULL, slot INTEGER NOT NULL, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (key, slot))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model_name, temperature, prompt):
+        """Returns the cache key of `prompt` rendered for `model_name` at `temperature`."""
+        return hashlib.sha256(f"{model_name}\0{temperature}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key, exclude=()):
+        """
+        Serves a cached response for `key`: always once its pool is full, and with a probability
+        equal to its fill ratio once it holds min_responses.
+        :param key: A key from make_key.
+        :param exclude: Slots that must not be served, e.g. those already used by the current quiz.
+        :return: A (slot, response) tuple, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ? AND created < ?", (key, now - self.ttl_seconds))
+            rows = self._db.execute(
+                "SELECT slot, response FROM responses WHERE key = ? ORDER BY last_used", (key,)
+            ).fetchall()
+
+            hit = None
+            if len(rows) >= self.min_responses and random.random() * self.diversity < len(rows):
+                hit = next(((slot, response) for slot, response in rows if slot not in exclude), None)
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ? AND slot = ?", (now, key, hit[0]))
+            self._db.commit()
+        return hit
+
+    def put(self, key, response):
+        """
+        Adds a response to the pool of `key` if the pool is not full yet.
+        :return: The slot the response was stored in, or None if it was not stored.
+        """
+        now = time.time()
+        with self._lock:
+            slots = {slot for (slot,) in self._db.execute("SELECT slot FROM responses WHERE key = ?", (key,))}
+            if len(slots) >= self.diversity:
+                return None
+            slot = next(slot for slot in range(self.diversity) if slot not in slots)
+            self._db.execute(
+                "INSERT INTO responses (key, slot, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, slot, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self._db.commit()
+        return slot
+
+    def _evict(self):
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        for key, slot, size in self._db.execute(
+            "SELECT key, slot, size FROM responses ORDER BY last_used"
+        ).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ? AND slot = ?", (key, slot))
+            total -= size
+            if total <= self.max_bytes:
+                break
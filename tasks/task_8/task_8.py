@@ -1,17 +1,57 @@
-import streamlit as st
 import os
 import sys
-import json
-sys.path.append(os.path.abspath('../../'))
+import functools
+import math
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+if __name__ == "__main__":
+    # Make the tasks package importable when this file is run as a script
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from tasks.task_3.task_3 import DocumentProcessor
 from tasks.task_4.task_4 import EmbeddingClient
 from tasks.task_5.task_5 import ChromaCollectionCreator
+from tasks import tracing
+from tasks.task_4.batching import estimate_tokens
+from tasks.task_8.json_stream import JsonObjectStreamParser, extract_json_object
+from tasks.task_8.question_index import DEFAULT_SIMILARITY_THRESHOLD, QuestionIndex
+from tasks.task_8.response_cache import ResponseCache
+from tasks.lazy import lazy_import
+
+st = lazy_import("streamlit")
+prompts = lazy_import("langchain_core.prompts")
+vertexai = lazy_import("langchain_google_vertexai")
+
+# Process-wide LLM clients, see shared_llm()
+_shared_llms = {}
+_shared_llms_lock = threading.Lock()
 
-from langchain_core.prompts import PromptTemplate
-from langchain_google_vertexai import VertexAI
+def shared_llm(model_name, temperature, max_output_tokens):
+    """
+    Returns the process-wide VertexAI client for the given configuration, creating it on first use,
+    so every QuizGenerator reuses the same client, its credentials and its open connections.
+    """
+    key = (model_name, temperature, max_output_tokens)
+    llm = _shared_llms.get(key)
+    if llm is None:
+        with _shared_llms_lock:
+            llm = _shared_llms.get(key)
+            if llm is None:
+                llm = _shared_llms[key] = vertexai.VertexAI(
+                    model_name=model_name, temperature=temperature, max_output_tokens=max_output_tokens
+                )
+    return llm
+
+@functools.lru_cache(maxsize=None)
+def compile_template(template):
+    """Parses a prompt template once per process, so rendering a prompt only fills in its variables."""
+    return prompts.PromptTemplate.from_template(template)
 
 class QuizGenerator:
-    def __init__(self, topic=None, num_questions=1, vectorstore=None):
+    def __init__(self, topic=None, num_questions=1, vectorstore=None, concurrency=1, context_k=1, questions_per_call=1,
+                 max_llm_calls=None, similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD, response_cache=None,
+                 served_slots=None):
         """
         Initializes the QuizGenerator with a required topic, the number of questions for the quiz,
         and an optional vectorstore for querying related information.
@@ -19,6 +59,14 @@ class QuizGenerator:
         :param topic: A string representing the required topic of the quiz.
         :param num_questions: An integer representing the number of questions to generate for the quiz, up to a maximum of 10.
         :param vectorstore: An optional vectorstore instance (e.g., ChromaDB) to be used for querying information related to the quiz topic.
+        :param concurrency: Number of question generations kept in flight at once by generate_quiz.
+        :param context_k: Number of retrieved chunks used as context for the questions.
+        :param questions_per_call: Number of questions requested from the LLM in a single call, as a JSON array.
+        :param max_llm_calls: Total LLM calls generate_quiz may make; defaults to 3 attempts per call a perfect run needs.
+        :param similarity_threshold: Jaccard similarity of content word sets (stopwords left out) at or above which two questions count as duplicates.
+        :param response_cache: An optional ResponseCache that serves LLM responses for identical prompts from disk.
+        :param served_slots: An optional dict of cache key -> set of response slots that must not be served again,
+                             shared by several quizzes and never reset. By default each quiz only excludes its own.
         """
         if not topic:
             self.topic = "General Knowledge"
@@ -28,10 +76,23 @@ class QuizGenerator:
         if num_questions > 10:
             raise ValueError("Number of questions cannot exceed 10.")
         self.num_questions = num_questions
+        self.concurrency = concurrency
+        self.context_k = context_k
+        self.questions_per_call = questions_per_call
+        self.max_llm_calls = max_llm_calls or 3 * math.ceil(num_questions / questions_per_call)
+        self.stats = {}  # Counters of the last generate_quiz run, see _reset_stats
+        self.response_cache = response_cache
+        self._keep_served_slots = served_slots is not None
+        self._served_slots = served_slots if served_slots is not None else defaultdict(set)  # Cache key -> used slots
+        self._stats_lock = threading.Lock()
+        self._context_cache = {}  # (collection version, topic, k) -> retrieved context
+        self._context_lock = threading.Lock()
 
         self.vectorstore = vectorstore
         self.llm = None
         self.question_bank = [] # Initialize the question bank to store questions
+        self.similarity_threshold = similarity_threshold
+        self.question_index = QuestionIndex(similarity_threshold)  # Duplicate index over question_bank
         self.system_template = """
             You are a subject matter expert on the topic: {topic}
             
@@ -54,6 +115,32 @@ class QuizGenerator:
                 "explanation": "<explanation as to why the answer is correct>"
             }}
             
+            Context: {context}
+            """
+        self.multi_question_template = """
+            You are a subject matter expert on the topic: {topic}
+            
+            Follow the instructions to create {count} different quiz questions:
+            1. Generate a question based on the topic provided and context as key "question"
+            2. Provide 4 multiple choice answers to the question as a list of key-value pairs "choices"
+            3. Provide the correct answer for the question from the list of answers as key "answer"
+            4. Provide an explanation as to why the answer is correct as key "explanation"
+            
+            You must respond as a JSON array of {count} objects, each with the following structure:
+            [
+                {{
+                    "question": "<question>",
+                    "choices": [
+                        {{"key": "A", "value": "<choice>"}},
+                        {{"key": "B", "value": "<choice>"}},
+                        {{"key": "C", "value": "<choice>"}},
+                        {{"key": "D", "value": "<choice>"}}
+                    ],
+                    "answer": "<answer key from choices list>",
+                    "explanation": "<explanation as to why the answer is correct>"
+                }}
+            ]
+            
             Context: {context}
             """
     
@@ -66,12 +153,13 @@ class QuizGenerator:
 
         :return: An instance or configuration for the LLM.
         """
-        self.llm = VertexAI(
+        self.llm = shared_llm(
             model_name = "gemini-pro",
             temperature = 0.8, # Increased for less deterministic questions
-            max_output_tokens = 500
+            max_output_tokens = 500 * self.questions_per_call # Room for every question of a multi-question call
         )
 
+    @tracing.traced("generate_question_with_vectorstore")
     def generate_question_with_vectorstore(self):
         """
         Generates a quiz question based on the topic provided using a vectorstore
@@ -83,64 +171,316 @@ class QuizGenerator:
         if not self.vectorstore:
             raise ValueError("Vectorstore not provided.")
         
-        from langchain_core.runnables import RunnablePassthrough, RunnableParallel
-
-        # Enable a Retriever
-        retriever = self.vectorstore.as_retriever()
+        # Retrieve the context once per topic instead of searching the vectorstore for every question
+        context = self.get_context()
         
-        # Use the system template to create a PromptTemplate
-        prompt = PromptTemplate.from_template(self.system_template)
-        
-        # RunnableParallel allows Retriever to get relevant documents
-        # RunnablePassthrough allows chain.invoke to send self.topic to LLM
-        setup_and_retrieval = RunnableParallel(
-            {"context": retriever, "topic": RunnablePassthrough()}
-        )
-        # Create a chain with the Retriever, PromptTemplate, and LLM
-        chain = setup_and_retrieval | prompt | self.llm
+        # Invoke the LLM with the topic and its retrieved context as input
+        return "".join(self._complete(self.system_template, {"topic": self.topic, "context": context}))
+
+    @tracing.traced("generate_questions_with_vectorstore")
+    def generate_questions_with_vectorstore(self, count):
+        """
+        Generates several quiz questions in a single LLM call using the vectorstore context.
+        The response is streamed and each question is yielded as soon as its JSON object is complete,
+        so closing the generator early stops reading the rest of the response.
 
-        # Invoke the chain with the topic as input
-        response = chain.invoke(self.topic)
-        return response
+        :param count: The number of questions to request.
+        :return: A generator of question dictionaries.
+        """
+        if not self.llm:
+            self.init_llm()
+        if not self.vectorstore:
+            raise ValueError("Vectorstore not provided.")
+
+        context = self.get_context()
+        inputs = {"topic": self.topic, "context": context, "count": count}
+
+        parser = JsonObjectStreamParser()
+        found = 0
+        completed = False
+        try:
+            for chunk in self._complete(self.multi_question_template, inputs, stream=True):
+                for question_dict in parser.feed(chunk):
+                    found += 1
+                    yield question_dict
+            completed = True
+        finally:
+            # Count undecodable objects, or the whole response if it was read to the end and held none at all
+            self._count("json_failures", parser.failures or (0 if found or not completed else 1))
+
+    def _complete(self, template, inputs, stream=False):
+        """
+        Renders the prompt and yields the LLM response as text chunks, a single chunk unless `stream` is set.
+        With a response cache, identical prompts are served from disk, never serving the same cached
+        response twice within one quiz, and complete fresh responses are added to the cache.
+        """
+        prompt = compile_template(template).format(**inputs)
+
+        key = None
+        if self.response_cache is not None:
+            key = ResponseCache.make_key(getattr(self.llm, "model_name", type(self.llm).__name__),
+                                         getattr(self.llm, "temperature", None), prompt)
+            with self._stats_lock:
+                cached = self.response_cache.get(key, exclude=self._served_slots[key])
+                if cached is not None:
+                    self._served_slots[key].add(cached[0])
+            if cached is not None:
+                self._count("cache_hits")
+                yield cached[1]
+                return
+
+        self._count("llm_calls")
+        tracing.count("llm_prompt_tokens", estimate_tokens(prompt))
+        if stream:
+            chunks = []
+            with tracing.span("llm.stream"):
+                for chunk in self.llm.stream(prompt):
+                    chunks.append(chunk)
+                    yield chunk
+            response = "".join(chunks)
+        else:
+            with tracing.span("llm.invoke"):
+                response = self.llm.invoke(prompt)
+            yield response
+        tracing.count("llm_response_tokens", estimate_tokens(response))
+
+        # Only reached when the whole response was consumed, so partial streams are never cached
+        if key is not None:
+            slot = self.response_cache.put(key, response)
+            if slot is not None:
+                with self._stats_lock:
+                    self._served_slots[key].add(slot)
+
+    def _iter_candidates(self, count):
+        """
+        Makes one LLM call for `count` questions and yields the decoded question dictionaries.
+        A single question uses the one-question template; more use the JSON array template.
+        """
+        if count > 1:
+            yield from self.generate_questions_with_vectorstore(count)
+            return
+
+        question_str = self.generate_question_with_vectorstore()
+        question_dict = extract_json_object(question_str)
+        if question_dict is None:
+            print("Failed to decode question JSON:", question_str)
+            self._count("json_failures")
+        else:
+            yield question_dict
+
+    def _stream_candidates(self, call_id, count, results, stop):
+        """
+        Worker thread body: makes one LLM call for `count` questions and puts every decoded question on
+        the `results` queue as ("question", call_id, question) as soon as it streams in, then
+        ("done", call_id, error or None). Stops reading the response once `stop` is set.
+        """
+        error = None
+        questions = self._iter_candidates(count)
+        try:
+            for question_dict in questions:
+                results.put(("question", call_id, question_dict))
+                if stop.is_set():
+                    break
+        except Exception as exception:
+            error = exception
+        finally:
+            questions.close()
+            results.put(("done", call_id, error))
+
+    def get_context(self):
+        """
+        Returns the context retrieved from the vectorstore for self.topic, cached per
+        (collection version, topic, k) so a new collection version is picked up automatically.
+        """
+        key = (self.vectorstore.version, self.topic, self.context_k)
+        context = self._context_cache.get(key)
+        if context is None:
+            # Concurrent generations wait for the first retrieval rather than repeating it
+            with self._context_lock:
+                context = self._context_cache.get(key)
+                if context is None:
+                    context = self.vectorstore.retrieve_context(self.topic, self.context_k)
+                    self._context_cache[key] = context
+        return context
 
     def generate_quiz(self) -> list:
         """
         Task: Generate a list of unique quiz questions based on the specified topic and number of questions.
+
+        Every malformed, invalid or duplicate response is replaced by a new generation, until the quiz
+        is complete or max_llm_calls calls have been made. self.stats counts the calls and their failures.
+        Errors raised by the LLM, such as authentication, quota or network errors, are not retried and propagate.
+        """
+        for _ in self.iter_quiz():
+            pass
+        return self.question_bank
+
+    def iter_quiz(self):
+        """
+        Generates the quiz like generate_quiz, but yields every question as soon as it is validated
+        and banked, so the first question can be shown after a single LLM round trip while the rest
+        are still being generated. Closing the generator early stops generating.
+
+        :return: A generator of question dictionaries, also collected in self.question_bank.
         """
         self.question_bank = []  # Reset the question bank
-        
-        retries_per_question = 3  # Maximum number of retries for each question
-
-        while len(self.question_bank) < self.num_questions:
-            question_str = self.generate_question_with_vectorstore()
-            retry_count = 0
-
-            while retry_count < retries_per_question:
-                try:
-                    question_dict = json.loads(question_str)
-                except json.JSONDecodeError:
-                    print("Failed to decode question JSON:", question_str)
-                    retry_count += 1
-                    continue
-                
-                if self.validate_question(question_dict):
-                    print("Successfully generated unique question")
-                    self.question_bank.append(question_dict)
+        self.question_index = QuestionIndex(self.similarity_threshold)
+        if not self._keep_served_slots:
+            self._served_slots.clear()
+        self._reset_stats()
+
+        with tracing.span("generate_quiz", topic=self.topic, num_questions=self.num_questions) as span:
+            if self.concurrency > 1:
+                yield from self._iter_quiz_concurrently()
+            else:
+                yield from self._iter_quiz_serially()
+            span.set(questions=len(self.question_bank), **self.stats)
+
+        if len(self.question_bank) < self.num_questions:
+            print("Max LLM calls reached for generating the quiz. Stopping.")
+        print(
+            f"Generated {len(self.question_bank)} questions with {self.stats['llm_calls']} LLM calls and "
+            f"{self.stats['cache_hits']} cache hits, {self.stats['wasted_calls']} of them wasted."
+        )
+
+    def _reset_stats(self):
+        self.stats = {
+            "llm_calls": 0,        # Calls made to the LLM
+            "cache_hits": 0,       # Responses served by the response cache instead of the LLM
+            "wasted_calls": 0,     # Calls, or cache hits, that did not add a single question to the bank and were retried
+            "json_failures": 0,    # Responses, or array items, that held no decodable JSON object
+            "schema_failures": 0,  # Decoded questions with missing or inconsistent fields
+            "duplicates": 0,       # Valid questions rejected as already in the bank
+        }
+
+    def _count(self, name, amount=1):
+        if amount:
+            with self._stats_lock:
+                self.stats[name] = self.stats.get(name, 0) + amount
+            tracing.count(f"quiz_{name}", amount)
+
+    def _bank_question(self, question_dict):
+        """Adds a question to the bank if it is still needed, well-formed and unique. Returns True if it was added."""
+        if len(self.question_bank) >= self.num_questions:
+            return False
+        if not self.validate_schema(question_dict):
+            print("Invalid question detected.")
+            self._count("schema_failures")
+            return False
+        if not self.validate_question(question_dict):
+            print("Duplicate question detected.")
+            self._count("duplicates")
+            return False
+        print("Successfully generated unique question")
+        self.question_bank.append(question_dict)
+        self.question_index.add(question_dict["question"])
+        return True
+
+    def _iter_quiz_serially(self):
+        """
+        Generates the quiz one LLM call at a time, asking for up to `questions_per_call` questions per call.
+        Questions are banked, and yielded, as they stream in, and later calls only ask for the shortfall.
+        Only malformed, invalid or duplicate questions are retried; errors raised by the LLM propagate.
+        """
+        calls = 0
+        while len(self.question_bank) < self.num_questions and calls < self.max_llm_calls:
+            count = min(self.questions_per_call, self.num_questions - len(self.question_bank))
+            calls += 1
+            banked = 0
+            questions = self._iter_candidates(count)
+            try:
+                for question_dict in questions:
+                    if self._bank_question(question_dict):
+                        banked += 1
+                        yield question_dict
+                    if len(self.question_bank) >= self.num_questions:
+                        break
+            finally:
+                questions.close()
+            if not banked:
+                self._count("wasted_calls")
+
+    def _iter_quiz_concurrently(self):
+        """
+        Generates the quiz with up to `concurrency` LLM calls in flight. Worker threads stream every
+        question onto a queue as it is decoded, so questions are validated, deduplicated and yielded
+        while their responses are still streaming. Once `num_questions` unique questions are banked,
+        calls that have not started yet are cancelled and running ones stop reading their responses.
+        An error raised by a call is re-raised here, after the remaining calls were stopped.
+        """
+        # Initialize the LLM once, before worker threads race to do it
+        if not self.llm:
+            self.init_llm()
+
+        calls = 0
+        pending = {}  # Call id -> number of questions still expected from it
+        banked = {}   # Call id -> number of its questions added to the bank
+        results = queue.Queue()
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            while len(self.question_bank) < self.num_questions:
+                # Keep calls in flight for the questions still missing, up to the concurrency limit
+                remaining = self.num_questions - len(self.question_bank) - sum(pending.values())
+                while remaining > 0 and len(pending) < self.concurrency and calls < self.max_llm_calls:
+                    count = min(self.questions_per_call, remaining)
+                    pending[calls] = count
+                    banked[calls] = 0
+                    executor.submit(self._stream_candidates, calls, count, results, stop)
+                    remaining -= count
+                    calls += 1
+                if not pending:
                     break
-                else:
-                    print("Duplicate or invalid question detected.")
-                    retry_count += 1
 
-            if retry_count >= retries_per_question:
-                print("Max retries reached for generating a question. Skipping.")
+                kind, call_id, payload = results.get()
+                if kind == "question":
+                    pending[call_id] = max(0, pending[call_id] - 1)
+                    if self._bank_question(payload):
+                        banked[call_id] += 1
+                        yield payload
+                    continue
+                del pending[call_id]
+                if payload is not None:
+                    raise payload  # An LLM or vectorstore error, not a bad response, so it is not retried
+                if not banked.pop(call_id):
+                    self._count("wasted_calls")
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        return self.question_bank
+    @staticmethod
+    def validate_schema(question) -> bool:
+        """
+        Checks that a decoded question has the structure requested by the templates: a non-empty
+        "question", exactly 4 choices with distinct "key"/"value" strings, an "answer" that is one
+        of the choice keys, and an "explanation" string.
+        """
+        if not isinstance(question, dict):
+            return False
+        if not isinstance(question.get("question"), str) or not question["question"].strip():
+            return False
+        if not isinstance(question.get("explanation"), str):
+            return False
+
+        choices = question.get("choices")
+        if not isinstance(choices, list) or len(choices) != 4:
+            return False
+        keys = []
+        for choice in choices:
+            if not isinstance(choice, dict) or not isinstance(choice.get("key"), str) or not isinstance(choice.get("value"), str):
+                return False
+            keys.append(choice["key"])
+        if len(set(keys)) != len(keys):
+            return False
+
+        return question.get("answer") in keys
 
     def validate_question(self, question: dict) -> bool:
         """
         Task: Validate a quiz question for uniqueness within the generated quiz.
 
         This method checks if the provided question (as a dictionary) is unique based on its text content compared to previously generated questions stored in `question_bank`. The goal is to ensure that no duplicate questions are added to the quiz.
+        Exact matches ignore case and punctuation, and paraphrases whose content word sets (stopwords left out) are at least `similarity_threshold` similar also count as duplicates.
 
         Parameters:
         - question: A dictionary representing the generated quiz question, expected to contain at least a "question" key.
@@ -157,8 +497,13 @@ class QuizGenerator:
         # Step 2: Extract the question text
         new_question_text = question["question"]
 
-        # Step 3: Check if a question with the same text already exists in the self.question_bank
-        is_unique = all(existing_question["question"] != new_question_text for existing_question in self.question_bank)
+        # Step 3: Check the question against the index of the questions in self.question_bank,
+        # rebuilding it first if the bank was changed without going through the index
+        if len(self.question_index) != len(self.question_bank):
+            self.question_index = QuestionIndex(self.similarity_threshold)
+            for existing_question in self.question_bank:
+                self.question_index.add(existing_question["question"])
+        is_unique = not self.question_index.is_duplicate(new_question_text)
 
         return is_unique
 
@@ -1,12 +1,16 @@
-import streamlit as st
 import os
 import sys
 import json
-sys.path.append(os.path.abspath('../../'))
+if __name__ == "__main__":
+    # Make the tasks package importable when this file is run as a script
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from tasks.task_3.task_3 import DocumentProcessor
 from tasks.task_4.task_4 import EmbeddingClient
 from tasks.task_5.task_5 import ChromaCollectionCreator
 from tasks.task_8.task_8 import QuizGenerator
+from tasks.lazy import lazy_import
+
+st = lazy_import("streamlit")
 
 class QuizManager:
     ##########################################################
@@ -0,0 +1,213 @@
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from itertools import count as _ids
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled, so a disabled span costs one flag check."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Span:
+    """A timed section of the pipeline, see span()."""
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.id = None
+        self.parent_id = None
+
+    def set(self, **attributes):
+        """Adds attributes, such as result sizes known only at the end of the span."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.id = next(self.tracer._span_ids)
+        self.parent_id = stack[-1].id if stack else None
+        stack.append(self)
+        self._start_time = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._start
+        stack = self.tracer._stack()
+        if self in stack:  # Not the case if a generator holding the span is closed on another thread
+            stack.remove(self)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer._record(self, duration)
+        return False
+
+class Tracer:
+    """
+    Collects timing spans and counters of the quiz pipeline.
+
+    Tracing is disabled unless the QUIZZIFY_TRACE environment variable is set to a true value
+    or enable() is called; while disabled, span() and count() return immediately. Every finished
+    span is aggregated per name (count, total and maximum duration) and kept, with its attributes
+    and parent span, in a bounded buffer of the most recent `max_spans` spans. Both can be exported
+    as Prometheus text or as JSON lines.
+    """
+
+    def __init__(self, enabled=False, max_spans=10_000):
+        """
+        :param enabled: Whether spans and counters are recorded.
+        :param max_spans: Number of most recent spans kept for export_json_lines.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._span_ids = _ids(1)
+        self._spans = deque(maxlen=max_spans)
+        self._durations = defaultdict(lambda: [0, 0.0, 0.0])  # Span name -> [count, total seconds, max seconds]
+        self._counters = defaultdict(float)  # (name, sorted label items) -> value
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Discards every recorded span and counter."""
+        with self._lock:
+            self._spans.clear()
+            self._durations.clear()
+            self._counters.clear()
+
+    def span(self, name, **attributes):
+        """
+        Returns a context manager timing the enclosed block as a span called `name`.
+        Spans opened inside it, on the same thread, are recorded as its children.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def traced(self, name):
+        """
+        Decorator recording every call of the function as a span called `name`.
+        For a generator function, the span lasts until the generator is exhausted or closed.
+        """
+        def decorator(function):
+            if inspect.isgeneratorfunction(function):
+                @functools.wraps(function)
+                def generator_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return (yield from function(*args, **kwargs))
+                    with Span(self, name, {}):
+                        return (yield from function(*args, **kwargs))
+                return generator_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Span(self, name, {}):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, amount=1, **labels):
+        """Adds `amount` to the counter `name` with the given labels."""
+        if not self.enabled or not amount:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += amount
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span, duration):
+        with self._lock:
+            aggregate = self._durations[span.name]
+            aggregate[0] += 1
+            aggregate[1] += duration
+            aggregate[2] = max(aggregate[2], duration)
+            self._spans.append({
+                "type": "span",
+                "name": span.name,
+                "id": span.id,
+                "parent_id": span.parent_id,
+                "thread": threading.current_thread().name,
+                "start": span._start_time,
+                "duration_seconds": duration,
+                "attributes": span.attributes,
+            })
+
+    def export_prometheus(self, prefix="quizzify"):
+        """Returns the counters and span durations in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            durations = sorted(self._durations.items())
+
+        lines = []
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (counter_name, labels), value in counters:
+                if counter_name == name:
+                    lines.append(f"{prefix}_{name}_total{_format_labels(labels)} {value:g}")
+        if durations:
+            lines.append(f"# TYPE {prefix}_span_duration_seconds summary")
+            for name, (span_count, total, _) in durations:
+                labels = _format_labels((("span", name),))
+                lines.append(f"{prefix}_span_duration_seconds_count{labels} {span_count}")
+                lines.append(f"{prefix}_span_duration_seconds_sum{labels} {total:.6f}")
+            lines.append(f"# TYPE {prefix}_span_duration_seconds_max gauge")
+            for name, (_, _, maximum) in durations:
+                lines.append(f"{prefix}_span_duration_seconds_max{_format_labels((('span', name),))} {maximum:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def export_json_lines(self):
+        """Returns the buffered spans, followed by the current counter values, as JSON lines."""
+        with self._lock:
+            records = list(self._spans)
+            records.extend(
+                {"type": "counter", "name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            )
+        return "".join(json.dumps(record, default=str) + "\n" for record in records)
+
+    def write_json_lines(self, path):
+        """Appends export_json_lines() to the file at `path`."""
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(self.export_json_lines())
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+# The process-wide tracer used by the task modules
+tracer = Tracer(enabled=os.environ.get("QUIZZIFY_TRACE", "").lower() in ("1", "true", "yes", "on"))
+span = tracer.span
+traced = tracer.traced
+count = tracer.count
+
+# With QUIZZIFY_TRACE_FILE set, everything recorded is appended there as JSON lines at exit
+if os.environ.get("QUIZZIFY_TRACE_FILE"):
+    atexit.register(tracer.write_json_lines, os.environ["QUIZZIFY_TRACE_FILE"])
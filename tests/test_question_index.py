@@ -0,0 +1,42 @@
+import pytest
+
+from tasks.task_8.question_index import QuestionIndex
+
+@pytest.mark.parametrize("first, second", [
+    ("What is the capital of Germany?", "What is the capital of France?"),
+    ("What is the primary function of the ribosome?", "What is the primary function of the mitochondria?"),
+    ("Which enzyme unwinds the DNA double helix during replication?",
+     "Which enzyme unwinds the DNA double helix during transcription?"),
+    ("What is DNA?", "What is RNA?"),
+    ("Who wrote Hamlet?", "Who wrote Macbeth?"),
+])
+def test_different_questions_are_not_duplicates(first, second):
+    index = QuestionIndex()
+    index.add(first)
+    assert not index.is_duplicate(second)
+
+@pytest.mark.parametrize("first, second", [
+    ("What is the capital of France?", "what is the capital of france"),
+    ("What is the capital of France?", "What is the capital of France ?!"),
+    ("Which organelle produces ATP in the cell?", "In the cell, which organelle produces ATP?"),
+    ("What is the powerhouse of the cell?", "What is the powerhouse of a cell?"),
+])
+def test_repeated_and_reworded_questions_are_duplicates(first, second):
+    index = QuestionIndex()
+    index.add(first)
+    assert index.is_duplicate(second)
+
+def test_questions_made_of_stopwords_only_are_compared_by_all_their_words():
+    index = QuestionIndex()
+    index.add("Who is it?")
+    assert not index.is_duplicate("What is it?")
+    assert index.is_duplicate("who is it")
+
+def test_every_added_question_is_checked():
+    index = QuestionIndex()
+    for country in ("Germany", "France", "Spain", "Italy"):
+        question = f"What is the capital of {country}?"
+        assert not index.is_duplicate(question)
+        index.add(question)
+    assert len(index) == 4
+    assert index.is_duplicate("What's the capital of Spain?")
@@ -0,0 +1,63 @@
+import itertools
+import json
+import re
+
+from langchain_core.language_models.llms import LLM
+
+from tasks.task_8.question_pool import QuestionPool
+from tasks.task_8.response_cache import ResponseCache
+from tasks.task_8.task_8 import QuizGenerator
+
+_questions = itertools.count()
+
+class NumberedLLM(LLM):
+    """Answers every prompt with new, numbered quiz questions."""
+
+    @property
+    def _llm_type(self):
+        return "numbered"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        multi_question = re.search(r"create (\d+) different quiz questions", prompt)
+        questions = [
+            {
+                "question": f"Which statement about item{next(_questions)} is true?",
+                "choices": [{"key": key, "value": key.lower()} for key in "ABCD"],
+                "answer": "A",
+                "explanation": "Because it is.",
+            }
+            for _ in range(int(multi_question.group(1)) if multi_question else 1)
+        ]
+        return json.dumps(questions if multi_question else questions[0])
+
+class Processor:
+    document_hashes = ["doc"]
+
+class Collection:
+    """Stands in for a ChromaCollectionCreator."""
+
+    version = 1
+    processor = Processor()
+    document_hashes = ["doc"]
+
+    def retrieve_context(self, topic, k=1):
+        return "Context about cells."
+
+def test_pool_with_response_cache_keeps_serving_new_questions(tmp_path, monkeypatch):
+    monkeypatch.setattr(QuizGenerator, "init_llm", lambda self: setattr(self, "llm", NumberedLLM()))
+    pool = QuestionPool(
+        Collection(), "cells", concurrency=2, questions_per_call=5,
+        response_cache=ResponseCache(str(tmp_path / "responses.sqlite3")),
+    )
+    pool.start()
+    try:
+        seen = set()
+        for _ in range(12):
+            quiz = pool.take(10, timeout=30)
+            assert len(quiz) == 10
+            questions = {question["question"] for question in quiz}
+            assert len(questions) == 10
+            assert not questions & seen
+            seen |= questions
+    finally:
+        pool.stop()